@@ -0,0 +1,366 @@
+"""Headless benchmarks for both games and the map draws. Results are saved as JSON and can be checked against an
+earlier run:
+
+    python benchmarks/bench.py --out baseline.json
+    python benchmarks/bench.py --compare baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# Runs without a window. Set SDL_VIDEODRIVER yourself to watch the boards being drawn. The game modules are imported
+# by the benchmarks using them, so comparing saved results doesn't need a word list
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "color_game"))
+
+import pygame
+
+# Maps placed on the color_game boards, the same as color_game/main.py
+BOARD_MAPS = ("DustII", "Ancient", "Mirage", "Office", "Agency", "Nuke", "Train", "Cache", "Overpass", "Inferno",
+              "Vertigo", "Mocha", "Grind", "Premiere")
+
+GRID_SIZES = [(6, 5), (13, 9), (20, 20), (40, 40)]
+QUICK_GRID_SIZES = [(6, 5), (13, 9)]
+
+# How much slower than the baseline a result can get before it's flagged
+DEFAULT_THRESHOLD = 0.15
+
+
+# Runs func repeat times, returning how long each run took in milliseconds
+def time_runs(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+# Summarizes timings where lower is better
+def summarize_times(times):
+    times = sorted(times)
+    return {"unit": "ms", "better": "lower", "median": statistics.median(times),
+            "p95": times[min(int(.95 * len(times)), len(times) - 1)], "min": times[0], "runs": len(times)}
+
+
+# Summarizes timings of runs doing ops operations each as a throughput, where higher is better
+def summarize_rate(times, ops):
+    rates = sorted([ops / (t / 1000) for t in times])
+    return {"unit": "ops/s", "better": "higher", "median": statistics.median(rates), "min": rates[0],
+            "runs": len(rates)}
+
+
+class ScriptedInput:
+    """Input source for timing game frames. Without a window pygame never moves the mouse, so each frame's input is
+    queued up front instead. Frames with nothing queued get no input at all"""
+
+    def __init__(self):
+        import inputs
+
+        self.frames = []
+        self.empty = inputs.FrameInput()
+
+    def queue(self, events=(), mouse_pos=(0, 0)):
+        import inputs
+
+        self.frames.append(inputs.FrameInput(events, mouse_pos))
+
+    def get_frame(self, wait=False):
+        return self.frames.pop(0) if self.frames else self.empty
+
+
+def make_game(dims, seed, input_source=None):
+    import game
+
+    random.seed(seed)
+    # The game prints its word coverage and every revealed letter
+    with contextlib.redirect_stdout(io.StringIO()):
+        return game.Game(BOARD_MAPS, grid_dims=dims, input_source=input_source)
+
+
+def bench_text_chance(results, seed, quick):
+    import text_chance
+
+    rng = random.Random(seed)
+    weights = text_chance.get_weights(text_chance.MAPS_ARCH, half=[0, 3], double=[5], eliminate=[8])
+    orders = 2000 if quick else 20000
+    results["text_chance.draw_order"] = summarize_rate(
+        time_runs(lambda: [text_chance.get_draw_order(weights, 10, rng) for _ in range(orders)], 7), orders)
+
+    table = text_chance.AliasTable(weights)
+    draws = 20000 if quick else 200000
+    results["text_chance.alias_draw"] = summarize_rate(
+        time_runs(lambda: [table.draw(rng) for _ in range(draws)], 7), draws)
+
+    items = [["map" + str(i), rng.randint(1, 1000)] for i in range(10000)]
+    results["text_chance.pool_pop_10000"] = summarize_rate(
+        time_runs(lambda: text_chance.get_draw_order(items, len(items), rng), 7), len(items))
+
+
+def bench_map_engine(results, seed, quick):
+    """Reveals every hidden tile of a 40 wide board. Each reveal recounts the letters of one row and one column"""
+    import map_engine
+
+    rng = random.Random(seed)
+    names = [map_engine.get_helper_string(rng=rng) for _ in range(200 if quick else 800)]
+    times = []
+    for _ in range(3):
+        engine = map_engine.MapGridEngine(names, len(names), 4, 40, rng=rng)
+        for idx in engine.get_hidden():
+            start = time.perf_counter()
+            engine.reveal(idx)
+            times.append((time.perf_counter() - start) * 1000)
+    results["map_engine.reveal"] = summarize_times(times)
+
+
+def bench_startup(results, seed, quick):
+    import sprites
+
+    for dims in QUICK_GRID_SIZES if quick else GRID_SIZES:
+        name = "{}x{}".format(*dims)
+        results["color_game.init." + name] = summarize_times(
+            time_runs(lambda: make_game(dims, seed), 3 if dims[0] * dims[1] > 400 else 10))
+
+        # Until the first frame is on screen
+        def show_first_frame():
+            g = make_game(dims, seed)
+            g.renderer.draw_board()
+            g.renderer.present()
+
+        results["color_game.interactive." + name] = summarize_times(
+            time_runs(show_first_frame, 3 if dims[0] * dims[1] > 400 else 10))
+
+        # Builds the board's tiles again on top of a finished game
+        g = make_game(dims, seed)
+        random.seed(seed)
+
+        def build_tiles():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for t in g.TILES:
+                    sprites.Tile(t.tile_type, g.tile_width, t.word, t.pos, g)
+
+        results["color_game.tiles." + name] = summarize_times(time_runs(build_tiles, 3))
+
+
+def bench_color_game_reveal(results, seed, quick):
+    """Reveal path without the event loop: reveal, HUD update and tile redraws"""
+    for dims in QUICK_GRID_SIZES if quick else GRID_SIZES[:3]:
+        g = make_game(dims, seed)
+        g.renderer.draw_board()
+        hidden = [t for t in g.TILES if not t.is_revealed]
+        random.Random(seed).shuffle(hidden)
+
+        times = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for t in hidden[:100]:
+                start = time.perf_counter()
+                t.reveal(g)
+                g.update_displays()
+                g.do_update_displays = False
+                for dirty in g.dirty_tiles:
+                    g.renderer.redraw_tile(dirty)
+                g.dirty_tiles = []
+                times.append((time.perf_counter() - start) * 1000)
+        g.renderer.dirty_rects = []
+        results["color_game.reveal.{}x{}".format(*dims)] = summarize_times(times)
+
+
+def bench_color_game_frames(results, seed, quick):
+    """Steady state frames of the game loop. Idle frames only move the cursor onto another tile, reveal frames are the
+    frame of a right click plus the next one, where the HUD catches up"""
+    import game
+
+    # Frames are timed uncapped
+    max_fps = game.Game.MAX_FPS
+    game.Game.MAX_FPS = 0
+    for dims in QUICK_GRID_SIZES if quick else GRID_SIZES[:3]:
+        source = ScriptedInput()
+        g = make_game(dims, seed, source)
+        g.renderer.draw_board()
+        g.renderer.present()
+
+        rng = random.Random(seed)
+        hidden = [t for t in g.TILES if not t.is_revealed]
+        rng.shuffle(hidden)
+
+        idle = []
+        reveal = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for frame in range(100 if quick else 400):
+                if frame % 10 == 0 and hidden:
+                    pos = g.camera.to_screen(hidden.pop().pos)
+                    pos = (int(pos[0]), int(pos[1]))
+                    source.queue([pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=pygame.BUTTON_RIGHT, pos=pos)], pos)
+                    source.queue([], pos)
+                    start = time.perf_counter()
+                    g.run_frame()
+                    g.run_frame()
+                    reveal.append((time.perf_counter() - start) * 1000)
+                else:
+                    pos = g.camera.to_screen(rng.choice(g.TILES).pos)
+                    pos = (int(pos[0]), int(pos[1]))
+                    source.queue([pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))], pos)
+                    start = time.perf_counter()
+                    g.run_frame()
+                    idle.append((time.perf_counter() - start) * 1000)
+
+        name = "{}x{}".format(*dims)
+        results["color_game.frame.idle." + name] = summarize_times(idle)
+        results["color_game.frame.reveal." + name] = summarize_times(reveal)
+    game.Game.MAX_FPS = max_fps
+
+
+def bench_color_game_camera(results, seed, quick):
+    """Frames panning the camera with the arrow keys, one step in from fitting the whole board and at full tile size"""
+    import game
+
+    max_fps = game.Game.MAX_FPS
+    game.Game.MAX_FPS = 0
+    for dims in GRID_SIZES[2:3] if quick else GRID_SIZES[2:]:
+        source = ScriptedInput()
+        g = make_game(dims, seed, source)
+        g.renderer.draw_board()
+        g.renderer.present()
+
+        name = "{}x{}".format(*dims)
+        for view, levels in (("zoomed_out", 1), ("full_size", -g.camera.min_level)):
+            # Starts from the middle of the board and steps back and forth, so the camera never stops at an edge
+            g.camera.reset()
+            g.camera.zoom_by(levels)
+            g.camera.pan(g.camera.board_size[0] * g.camera.zoom, g.camera.board_size[1] * g.camera.zoom)
+            g.camera.pan(-g.camera.board_size[0] * g.camera.zoom / 2, -g.camera.board_size[1] * g.camera.zoom / 2)
+            g.renderer.draw_view()
+
+            times = []
+            for frame in range(40 if quick else 120):
+                key = pygame.K_RIGHT if frame % 2 == 0 else pygame.K_LEFT
+                source.queue([pygame.event.Event(pygame.KEYDOWN, key=key, mod=0)], g.camera.viewport.center)
+                start = time.perf_counter()
+                g.run_frame()
+                times.append((time.perf_counter() - start) * 1000)
+            results["color_game.pan.{}.{}".format(view, name)] = summarize_times(times)
+    game.Game.MAX_FPS = max_fps
+
+
+def bench_map_grid_frames(results, seed, quick):
+    """Frames of the map_grid.py loop. Importing the script sets up its window, so this has to run last"""
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import map_grid
+
+    map_grid.draw_region(map_grid.screen.get_rect())
+    rng = random.Random(seed)
+    idle = []
+    reveal = []
+    for frame in range(100 if quick else 400):
+        hidden = map_grid.engine.get_hidden()
+        if frame % 10 == 0 and hidden:
+            event = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=pygame.BUTTON_LEFT,
+                                       pos=map_grid.get_tile_rect(rng.choice(hidden)).center)
+            times = reveal
+        else:
+            event = pygame.event.Event(pygame.MOUSEMOTION, pos=(rng.randrange(map_grid.screen.get_width()),
+                                                                rng.randrange(map_grid.screen.get_height())),
+                                       rel=(0, 0), buttons=(0, 0, 0))
+            times = idle
+        start = time.perf_counter()
+        map_grid.run_frame([event])
+        times.append((time.perf_counter() - start) * 1000)
+
+    results["map_grid.frame.idle"] = summarize_times(idle)
+    results["map_grid.frame.reveal"] = summarize_times(reveal)
+
+
+BENCHMARKS = {"text_chance": bench_text_chance, "map_engine": bench_map_engine, "startup": bench_startup,
+              "reveal": bench_color_game_reveal, "frames": bench_color_game_frames, "camera": bench_color_game_camera,
+              "map_grid": bench_map_grid_frames}
+
+
+def run(names, seed=0, quick=False):
+    """Runs the named benchmarks, imports of the game modules included, and returns the results with some details
+    about the machine"""
+    pygame.init()
+    results = {}
+    for name in names:
+        print("Running " + name + "...", file=sys.stderr)
+        BENCHMARKS[name](results, seed, quick)
+    return {"meta": {"seed": seed, "quick": quick, "python": platform.python_version(),
+                     "pygame": pygame.version.ver, "platform": platform.platform(),
+                     "video_driver": os.environ.get("SDL_VIDEODRIVER")},
+            "results": results}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Prints how every result moved against the baseline. Returns the names of the ones that got worse by more than
+    threshold (a fraction)"""
+    for key in ("seed", "quick", "video_driver"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print("Warning: baseline was run with {}={} but these results with {}={}".format(
+                key, baseline["meta"].get(key), key, current["meta"].get(key)))
+
+    regressions = []
+    print("{:<36}{:>14}{:>14}{:>10}".format("benchmark", "baseline", "current", "change"))
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            print("{:<36}{:>14}{:>14.3f}".format(name, "-", result["median"]))
+            continue
+
+        # How much worse the result got, whichever direction is better
+        if result["better"] == "lower":
+            slowdown = result["median"] / base["median"] - 1 if base["median"] else 0
+        else:
+            slowdown = base["median"] / result["median"] - 1 if result["median"] else float("inf")
+
+        flag = ""
+        if slowdown > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("{:<36}{:>14.3f}{:>14.3f}{:>+9.1f}%{}".format(name, base["median"], result["median"], slowdown * 100,
+                                                           flag))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times board construction, frames, reveals and map draws headlessly")
+    parser.add_argument("--out", help="where to write the results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON to flag regressions against")
+    parser.add_argument("--current", metavar="RESULTS",
+                        help="compare these saved results to the baseline instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown (as a fraction) that counts as a regression")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="smaller boards and fewer runs")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        # map_grid takes over the display, so it always goes last
+        current = run(sorted(args.only, key=lambda n: n == "map_grid"), args.seed, args.quick)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), current, args.threshold)
+        if regressions:
+            print(str(len(regressions)) + " regression(s): " + ", ".join(regressions))
+            sys.exit(1)
+    elif not args.out:
+        print(json.dumps(current, indent=2))
@@ -0,0 +1,68 @@
+"""Checks that map_grid.py's dirty rect rendering puts the same pixels on screen as redrawing everything. Reveals tiles
+one frame at a time and compares the screen against a full redraw after each one. Exits with 1 on any difference:
+
+    python benchmarks/check_map_grid.py
+    python benchmarks/check_map_grid.py --maps 311
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame
+
+
+# Counts the pixels of the screen that change when everything gets redrawn
+def count_stale_pixels(map_grid):
+    shown = pygame.image.tobytes(map_grid.screen, "RGB")
+    map_grid.draw_region(map_grid.screen.get_rect())
+    redrawn = pygame.image.tobytes(map_grid.screen, "RGB")
+    return sum([1 for i in range(0, len(shown), 3) if shown[i:i + 3] != redrawn[i:i + 3]])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares map_grid's dirty rect redraws against full redraws")
+    parser.add_argument("--maps", type=int, help="play with this many made up maps instead of the default pool, "
+                                                 "giving a denser board")
+    parser.add_argument("--reveals", type=int, default=60, help="how many tiles to reveal")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.maps is not None:
+        import map_engine
+        map_engine.MAPS = ["Map" + str(i) for i in range(args.maps)]
+
+    pygame.init()
+    # The board is set up on import
+    with contextlib.redirect_stdout(io.StringIO()):
+        import map_grid
+    map_grid.DIRTY_RECT_RENDERING = True
+    map_grid.draw_region(map_grid.screen.get_rect())
+
+    rng = random.Random(args.seed)
+    failures = 0
+    reveals = 0
+    for _ in range(args.reveals):
+        hidden = map_grid.engine.get_hidden()
+        if not hidden:
+            break
+        map_grid.run_frame([pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=pygame.BUTTON_LEFT,
+                                               pos=map_grid.get_tile_rect(rng.choice(hidden)).center)])
+        reveals += 1
+        stale = count_stale_pixels(map_grid)
+        if stale:
+            failures += 1
+            print("Reveal {}: {} pixels differ from a full redraw".format(reveals, stale))
+
+    print("{} of {} reveals left stale pixels on a {}x{} board with {}px squares".format(
+        failures, reveals, map_grid.width, map_grid.height, map_grid.square_dim))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,222 @@
+import pygame
+from array import array
+
+
+class AnnotationLayer:
+    """Pen and eraser input kept as stroke records instead of a screen sized surface. Every stroke is a row in a set of
+    array backed columns, with its points stored flat in one shared buffer. Strokes get rasterized into a grid of
+    TILE_SIZE tiles, created when first drawn on, so new input only touches the tiles under it. Undoing, redoing or
+    clearing replays just the strokes that touch the affected tiles"""
+
+    TILE_SIZE = 128
+
+    # Stroke kinds. Clears store the corners of the cleared rect as their two points
+    PEN = 0
+    ERASER = 1
+    CLEAR = 2
+
+    def __init__(self, size, eraser_radius):
+        self.size = size
+        self.eraser_radius = eraser_radius
+
+        self.eraser_brush = pygame.Surface((eraser_radius*2, eraser_radius*2), pygame.SRCALPHA, 32)
+        pygame.draw.circle(self.eraser_brush, (0, 0, 0), (eraser_radius, eraser_radius), eraser_radius)
+        self.eraser_brush = self.eraser_brush.convert_alpha()
+
+        # Stroke records
+        self.kinds = array("B")
+        self.colors = array("I")
+        self.widths = array("H")
+        self.starts = array("I")
+        self.lengths = array("I")
+        self.points = array("i")
+
+        # Undone strokes as (kind, color, width, points), most recent last
+        self.redo_stack = []
+
+        # Stroke currently being drawn, if any
+        self.active = False
+
+        # Rasterized tiles and the strokes that touch each one, keyed by (column, row)
+        self.tiles = {}
+        self.tile_strokes = {}
+
+        # Screen regions changed since the renderer last collected them
+        self.dirty_rects = []
+
+    @staticmethod
+    def pack_color(color):
+        color = pygame.Color(color)
+        return (color.r << 24) | (color.g << 16) | (color.b << 8) | color.a
+
+    @staticmethod
+    def unpack_color(packed):
+        return packed >> 24, (packed >> 16) & 255, (packed >> 8) & 255, packed & 255
+
+    def get_point(self, stroke, i):
+        return self.points[(self.starts[stroke] + i) * 2], self.points[(self.starts[stroke] + i) * 2 + 1]
+
+    # Screen rect affected by the part of a stroke from point i - 1 to point i (or just point i for i = 0)
+    def get_segment_rect(self, stroke, i):
+        x2, y2 = self.get_point(stroke, i)
+        x1, y1 = self.get_point(stroke, i - 1) if i and self.kinds[stroke] != AnnotationLayer.ERASER else (x2, y2)
+        if self.kinds[stroke] == AnnotationLayer.CLEAR:
+            return pygame.Rect(x1, y1, x2 - x1, y2 - y1)
+
+        pad = self.eraser_radius if self.kinds[stroke] == AnnotationLayer.ERASER else self.widths[stroke]
+        return pygame.Rect(min(x1, x2) - pad, min(y1, y2) - pad, abs(x2 - x1) + pad * 2 + 1, abs(y2 - y1) + pad * 2 + 1)
+
+    def get_tile_keys(self, rect):
+        rect = rect.clip(pygame.Rect((0, 0), self.size))
+        if not rect.width or not rect.height:
+            return []
+        return [(col, row) for row in range(rect.top // AnnotationLayer.TILE_SIZE, (rect.bottom - 1) // AnnotationLayer.TILE_SIZE + 1)
+                for col in range(rect.left // AnnotationLayer.TILE_SIZE, (rect.right - 1) // AnnotationLayer.TILE_SIZE + 1)]
+
+    def get_tile_rect(self, key):
+        return pygame.Rect(key[0] * AnnotationLayer.TILE_SIZE, key[1] * AnnotationLayer.TILE_SIZE,
+                           AnnotationLayer.TILE_SIZE, AnnotationLayer.TILE_SIZE)
+
+    # Gets what a segment of a stroke puts down as (surface, screen rect, blend flags). Pen lines are drawn whole into
+    # their own surface because pygame would round a line clipped to a tile edge differently
+    def get_segment_stamp(self, stroke, i):
+        rect = self.get_segment_rect(stroke, i)
+        if self.kinds[stroke] == AnnotationLayer.ERASER:
+            return self.eraser_brush, self.eraser_brush.get_rect(center=self.get_point(stroke, i)), pygame.BLEND_RGBA_SUB
+        if self.kinds[stroke] == AnnotationLayer.CLEAR or not i:
+            return None, rect, 0
+
+        surf = pygame.Surface(rect.size, pygame.SRCALPHA, 32)
+        (x1, y1), (x2, y2) = self.get_point(stroke, i - 1), self.get_point(stroke, i)
+        pygame.draw.line(surf, self.unpack_color(self.colors[stroke]), (x1 - rect.left, y1 - rect.top),
+                         (x2 - rect.left, y2 - rect.top), self.widths[stroke])
+        return surf, rect, 0
+
+    # Puts a segment's stamp down on one tile. Clears leave missing tiles alone and drop the tiles they cover whole
+    def rasterize_segment(self, stroke, i, key, stamp):
+        surf, rect, flags = stamp
+        if self.kinds[stroke] == AnnotationLayer.CLEAR:
+            if key in self.tiles and rect.contains(self.get_tile_rect(key)):
+                del self.tiles[key]
+            if key not in self.tiles:
+                return
+        elif surf is None:
+            return
+
+        if key not in self.tiles:
+            self.tiles[key] = pygame.Surface((AnnotationLayer.TILE_SIZE, AnnotationLayer.TILE_SIZE), pygame.SRCALPHA, 32).convert_alpha()
+        tile_rect = self.get_tile_rect(key)
+        if surf is None:
+            # Clipped first, as fill keeps the whole width and height of a rect hanging off the surface's left or top edge
+            self.tiles[key].fill((0, 0, 0, 0), rect.clip(tile_rect).move(-tile_rect.left, -tile_rect.top))
+        else:
+            self.tiles[key].blit(surf, rect.move(-tile_rect.left, -tile_rect.top), None, flags)
+
+    # Rasterizes the newest segment of a stroke and remembers which tiles it touched. A missing tile has nothing on it
+    # yet, so clears skip those
+    def add_segment(self, stroke, i):
+        stamp = self.get_segment_stamp(stroke, i)
+        keys = self.get_tile_keys(stamp[1])
+        if self.kinds[stroke] == AnnotationLayer.CLEAR:
+            keys = [key for key in keys if key in self.tiles]
+            if not keys:
+                return
+        for key in keys:
+            strokes = self.tile_strokes.setdefault(key, [])
+            if not strokes or strokes[-1] != stroke:
+                strokes.append(stroke)
+            self.rasterize_segment(stroke, i, key, stamp)
+        self.dirty_rects.append(stamp[1])
+
+    # Clears tiles and replays every stroke that touches them
+    def rebuild_tiles(self, keys):
+        for key in keys:
+            tile_rect = self.get_tile_rect(key)
+            strokes = self.tile_strokes.get(key, [])
+            if not strokes:
+                self.tiles.pop(key, None)
+                self.tile_strokes.pop(key, None)
+            else:
+                if key in self.tiles:
+                    self.tiles[key].fill((0, 0, 0, 0))
+                for stroke in strokes:
+                    for i in range(self.lengths[stroke]):
+                        if self.get_segment_rect(stroke, i).colliderect(tile_rect):
+                            self.rasterize_segment(stroke, i, key, self.get_segment_stamp(stroke, i))
+            self.dirty_rects.append(tile_rect)
+
+    def push_stroke(self, kind, color, width, points):
+        self.kinds.append(kind)
+        self.colors.append(self.pack_color(color))
+        self.widths.append(int(width))
+        self.starts.append(len(self.points) // 2)
+        self.lengths.append(len(points) // 2)
+        self.points.extend(points)
+        stroke = len(self.kinds) - 1
+        for i in range(self.lengths[stroke]):
+            self.add_segment(stroke, i)
+
+    def begin_stroke(self, kind, color, width, point):
+        self.end_stroke()
+        self.push_stroke(kind, color, width, [int(point[0]), int(point[1])])
+        self.redo_stack = []
+        self.active = True
+
+    def add_point(self, point):
+        stroke = len(self.kinds) - 1
+        if not self.active or self.get_point(stroke, self.lengths[stroke] - 1) == (int(point[0]), int(point[1])):
+            return
+        self.points.extend([int(point[0]), int(point[1])])
+        self.lengths[stroke] += 1
+        self.add_segment(stroke, self.lengths[stroke] - 1)
+
+    def end_stroke(self):
+        self.active = False
+
+    def clear(self, rect=None):
+        """Clears a screen rect, or everything. Recorded as a stroke so it can be undone"""
+        rect = pygame.Rect(rect) if rect is not None else pygame.Rect((0, 0), self.size)
+        self.end_stroke()
+        self.push_stroke(AnnotationLayer.CLEAR, (0, 0, 0, 0), 0, [rect.left, rect.top, rect.right, rect.bottom])
+        self.redo_stack = []
+
+    def pop_stroke(self):
+        stroke = len(self.kinds) - 1
+        start = self.starts[stroke] * 2
+        record = (self.kinds.pop(), self.unpack_color(self.colors.pop()), self.widths.pop(), self.points[start:])
+        self.starts.pop()
+        self.lengths.pop()
+        del self.points[start:]
+        return record
+
+    def undo(self):
+        if not len(self.kinds):
+            return
+        self.end_stroke()
+        stroke = len(self.kinds) - 1
+
+        # The stroke is the newest one, so it's always last in the lists of the tiles it touched
+        keys = [key for key, strokes in self.tile_strokes.items() if strokes and strokes[-1] == stroke]
+        for key in keys:
+            self.tile_strokes[key].pop()
+        self.redo_stack.append(self.pop_stroke())
+        self.rebuild_tiles(keys)
+
+    def redo(self):
+        if not self.redo_stack:
+            return
+        self.end_stroke()
+        self.push_stroke(*self.redo_stack.pop())
+
+    def collect_dirty_rects(self):
+        rects = self.dirty_rects
+        self.dirty_rects = []
+        return rects
+
+    # Draws the tiles overlapping a screen rect
+    def draw(self, screen, rect):
+        for key in self.get_tile_keys(rect):
+            if key in self.tiles:
+                tile_rect = self.get_tile_rect(key)
+                clipped = tile_rect.clip(rect)
+                screen.blit(self.tiles[key], clipped, clipped.move(-tile_rect.left, -tile_rect.top))
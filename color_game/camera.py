@@ -0,0 +1,92 @@
+import math
+
+import pygame
+
+
+class Camera:
+    """Maps between board coordinates, where tiles are laid out at their full width, and the screen. The board is shown
+    inside viewport (a screen rect), offset by a pan and scaled by ZOOM_STEP to a whole power. Keeping to those steps
+    means only a handful of tile sizes ever get rendered and cached"""
+
+    ZOOM_STEP = 1.25
+    MAX_ZOOM_LEVEL = 4
+
+    # How far one pan moves, as a fraction of the viewport
+    PAN_FRACTION = 0.1
+
+    def __init__(self, viewport, board_size):
+        self.viewport = pygame.Rect(viewport)
+        self.board_size = tuple(board_size)
+
+        # Zoomed out as far as it goes, the whole board fits in the viewport
+        fit = min(self.viewport.width / self.board_size[0], self.viewport.height / self.board_size[1])
+        self.min_level = min(math.floor(math.log(fit, Camera.ZOOM_STEP) + 1e-9), 0)
+
+        self.level = self.min_level
+        self.zoom = Camera.ZOOM_STEP ** self.level
+        # Board position shown at the viewport's top left
+        self.offset = [0.0, 0.0]
+
+    def to_screen(self, pos):
+        return (self.viewport.left + (pos[0] - self.offset[0]) * self.zoom,
+                self.viewport.top + (pos[1] - self.offset[1]) * self.zoom)
+
+    def to_board(self, pos):
+        return (self.offset[0] + (pos[0] - self.viewport.left) / self.zoom,
+                self.offset[1] + (pos[1] - self.viewport.top) / self.zoom)
+
+    # Smallest screen rect covering a board rect
+    def to_screen_rect(self, rect):
+        left, top = self.to_screen(rect.topleft)
+        right, bottom = self.to_screen(rect.bottomright)
+        return pygame.Rect(math.floor(left), math.floor(top),
+                           math.ceil(right) - math.floor(left), math.ceil(bottom) - math.floor(top))
+
+    # Smallest board rect covering a screen rect
+    def to_board_rect(self, rect):
+        left, top = self.to_board(rect.topleft)
+        right, bottom = self.to_board(rect.bottomright)
+        return pygame.Rect(math.floor(left), math.floor(top),
+                           math.ceil(right) - math.floor(left), math.ceil(bottom) - math.floor(top))
+
+    def get_visible_rect(self):
+        """Gets the board rect shown in the viewport"""
+        return self.to_board_rect(self.viewport)
+
+    # Keeps the pan within the board. A board smaller than the viewport stays in its top left
+    def clamp(self):
+        for axis in (0, 1):
+            far = self.board_size[axis] - self.viewport.size[axis] / self.zoom
+            self.offset[axis] = min(max(self.offset[axis], 0.0), max(far, 0.0))
+
+    def pan(self, dx, dy):
+        """Moves the view by a screen distance. Returns whether it moved"""
+        before = tuple(self.offset)
+        self.offset[0] += dx / self.zoom
+        self.offset[1] += dy / self.zoom
+        self.clamp()
+        return tuple(self.offset) != before
+
+    def zoom_by(self, levels, anchor=None):
+        """Zooms in (or out, for negative levels) keeping the board under the anchor screen position in place. Returns
+        whether the zoom changed"""
+        level = min(max(self.level + levels, self.min_level), Camera.MAX_ZOOM_LEVEL)
+        if level == self.level:
+            return False
+
+        anchor = anchor if anchor is not None and self.viewport.collidepoint(anchor) else self.viewport.center
+        board_anchor = self.to_board(anchor)
+        self.level = level
+        self.zoom = Camera.ZOOM_STEP ** level
+        self.offset = [board_anchor[0] - (anchor[0] - self.viewport.left) / self.zoom,
+                       board_anchor[1] - (anchor[1] - self.viewport.top) / self.zoom]
+        self.clamp()
+        return True
+
+    def reset(self):
+        """Zooms all the way out. Returns whether anything changed"""
+        changed = self.level != self.min_level or self.offset != [0.0, 0.0]
+        self.level = self.min_level
+        self.zoom = Camera.ZOOM_STEP ** self.level
+        self.offset = [0.0, 0.0]
+        return changed
@@ -1,16 +1,26 @@
 import pygame
 import random
-import requests
+import functools
+import words
 pygame.font.init()
 
-# Loads huge word lib
-word_site = "https://www.mit.edu/~ecprice/wordlist.100000"
-response = requests.get(word_site)
-WORDS = [w.decode("utf-8") for w in response.content.splitlines()]
+# Loads huge word lib from the local cache
+WORDS = words.load_word_source()
 
 
 def get_word():
-    return random.choice(WORDS)
+    return WORDS.get_word(random)
+
+
+# Letter mask index over WORDS, loaded the first time it's needed
+_word_index = None
+
+
+def get_word_index():
+    global _word_index
+    if _word_index is None:
+        _word_index = words.WordIndex(WORDS)
+    return _word_index
 
 
 def remove_dupes_keep_order(seq):
@@ -42,35 +52,34 @@ def posscale(*coordinate, screen_size, divisor=(1000, 900)):
         return coordinate[0] / divisor[0] * screen_size[0]
 
 
+# Font files are looked up in the system font list once. None means the font wasn't found, which makes pygame use its
+# default font just like SysFont would
+WORD_FONT_PATH = pygame.font.match_font("Arial")
+GUI_FONT_PATH = pygame.font.match_font("Calibri Body")
+
+
+# Loaded fonts shared by the whole game, keyed by (font file, size in whole pixels)
+@functools.lru_cache(maxsize=64)
+def load_font(path, size):
+    return pygame.font.Font(path, size)
+
+
 def get_word_font(size):
-    return pygame.font.SysFont("Arial", int(size))
+    return load_font(WORD_FONT_PATH, int(size))
 
 
 def get_gui_font(size):
-    return pygame.font.SysFont("Calibri Body", int(size))
-
-
-def get_max_diff_range(color_range_length, num_colors):
-    """# MATH PROBLEM FOR CALCULATING MAX DIFF_RANGE WITHOUT CAUSING A POTENTIAL INFINITE LOOP
-    (ie diff_range is basically X/2, since it represents the bounds within which another color cannot be chosen
-    L represents the Hue range (colorsys has a range of 0-1, so L=1. N is the number of total colors that need to
-    be chosen)
-
-    Given a line segment of length "L", and "N" smaller line segments of equal length, "X", which must fit on the
-    larger line segment without overlapping, what is the maximum length of "X" such that if the smaller line
-    segments are added to random parts of the larger line segment one by one (assuming the randomization ensures
-    no overlap), there is 100% chance that all the smaller line segments will all fit (If "X" is too large, for
-    example, there might be a point where if the first few smaller line segments have been randomly distributed
-    across the larger line in a highly inefficient manner, the next line segment will not have space to be placed
-    without overlap)"""
-    # d is a special value which calculates how many intervals to split the # line into to encompass num_colors,
-    # since splitting the number line in half repeatedly is the LEAST efficient way to distribute the colors,
-    # Thus accounting for the possibility of least efficiency and ensuring its impossible
-    def get_d(previous_value, depth, num_cols):
-        num = previous_value + (2**depth)
-        if num_cols <= num:
-            return num
-        else:
-            return get_d(num, depth + 1, num_cols)
-    d = get_d(0, 0, num_colors)
-    return (color_range_length / (d+1)) / 2  # diff range is actually half the calculated range, hence /2
+    return load_font(GUI_FONT_PATH, int(size))
+
+
+def get_hues(num_colors, hue_range=(0, 0.9), jitter=0.5, rng=random):
+    """Spreads num_colors hues over hue_range without any retries. The range is cut into equal slices and each hue goes
+    somewhere in the middle of its own slice, moving at most jitter/2 of a slice away from the slice center. Any two
+    hues are therefore at least (1 - jitter) slices apart, however many colors there are. The end of the range is kept
+    short of 1 since hues wrap around back to red"""
+    slice_width = (hue_range[1] - hue_range[0]) / num_colors
+    hues = [hue_range[0] + (i + 0.5 + (rng.random() - 0.5) * jitter) * slice_width for i in range(num_colors)]
+
+    # Colors are handed out in a random order, not sorted by hue
+    rng.shuffle(hues)
+    return hues
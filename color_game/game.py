@@ -1,17 +1,38 @@
 import pygame
 import sprites
 import const
+import words
+import renderer
+import annotations
+import camera
+import profiler
+import inputs
 import time
 import math
 import random
 import colorsys
-from win32api import GetSystemMetrics
 import copy
 
+# win32api only exists on Windows. Everywhere else the monitor size comes from SDL
+try:
+    from win32api import GetSystemMetrics
+except ImportError:
+    GetSystemMetrics = None
+
 
 #[print([i*255 for i in colorsys.hsv_to_rgb(*(random.randint(0, 1000) / 1000, 1, 1))]) for i in range(10)]
 
 
+# Gets the resolution of the main monitor
+def get_screen_dimensions():
+    if GetSystemMetrics is not None:
+        return GetSystemMetrics(0), GetSystemMetrics(1)
+    # Only asks once the display is up, which setting the window's mode would have done anyway
+    pygame.display.init()
+    sizes = pygame.display.get_desktop_sizes()
+    return sizes[0] if sizes and min(sizes[0]) > 0 else (1920, 1080)
+
+
 class Game:
     NUM_COLORS = random.randint(4, 8)
     SPACE_BETWEEN_TILES = 0.1  # As a percent of total tile width
@@ -24,36 +45,63 @@ class Game:
     EXTEND_RIGHT = 300
     EXTEND_DOWN = 300
 
+    # Tiles never get narrower than this on the board. Grids too big to fit at this width get a smaller viewport onto
+    # the board that can be panned with the arrow keys and zoomed with +/- (Home zooms back out)
+    MIN_TILE_WIDTH = 64
+
     ERASER_RADIUS = 25
 
+    # Frame rate cap while something is moving. When nothing is, the game sleeps until there's input
+    MAX_FPS = 60
+
+    # Milliseconds before a held key starts repeating and between repeats
+    KEY_REPEAT_DELAY = 250
+    KEY_REPEAT_INTERVAL = 30
+
+    # Milliseconds per frame spent building tile surfaces before they're needed
+    WARM_UP_BUDGET = 4
+
     class Color:
         def __init__(self, hsv):
             self.hsv = hsv
             self.rgb = tuple([int(i*255) for i in colorsys.hsv_to_rgb(*self.hsv)])
 
+            # Letters in the order they were assigned and revealed, plus the same letters as bitmasks
             self.letters = ""
             self.revealed_letters = ""
+            self.letter_mask = 0
+            self.revealed_mask = 0
 
         def assign_letter(self, letter):
             if len(letter) == 1:
                 self.letters += letter
+                self.letter_mask |= words.get_letter_mask(letter)
             else:
                 print("Failed to add letter")
                 return -1
 
         def reveal_letters(self, chars):
             print(chars, self.letters, self.revealed_letters)
-            for c in list(set(chars)):
-                if c.lower() in self.letters and c.lower() not in self.revealed_letters:
-                    self.revealed_letters += c.lower()
+            new_mask = words.get_letter_mask(chars) & self.letter_mask & ~self.revealed_mask
+            for c in chars.lower():
+                bit = words.get_letter_mask(c)
+                if new_mask & bit:
+                    self.revealed_letters += c
+                    new_mask &= ~bit
+                    self.revealed_mask |= bit
 
         def __repr__(self):
             return str((self.rgb, self.letters))
 
-    def __init__(self, maps, grid_dims=(6, 5), word_gen_func=const.get_word):
+    def __init__(self, maps, grid_dims=(6, 5), word_gen_func=const.get_word, coverage_target=None, num_colors=None,
+                 screen_dimensions=None, input_source=None):
         # Event array
         self.events = []
 
+        # Where input comes from (an inputs.LiveInput unless it's being replayed) and what it was last frame
+        self.input = input_source if input_source is not None else inputs.LiveInput()
+        self.frame_input = inputs.FrameInput()
+
         # Game run flag
         self.running = True
 
@@ -65,7 +113,9 @@ class Game:
         total_tiles = self.grid_dims[0] * self.grid_dims[1]
 
         # Calculates tile width based on monitor size
-        screen_dimensions = GetSystemMetrics(0), GetSystemMetrics(1)
+        if screen_dimensions is None:
+            screen_dimensions = get_screen_dimensions()
+        self.screen_dimensions = tuple(screen_dimensions)
 
         # If the full-fill tile width for the width of the screen causes it to exceed vertically, then the vertical
         # screen dimension is the one that should be used to determine screen size
@@ -74,39 +124,55 @@ class Game:
         else:
             tile_width = (Game.TILE_PERCENT_OF_SCREEN * screen_dimensions[0]) / self.grid_dims[0]
 
-        self.tile_width = int(tile_width)
+        # The viewport stays as big as the fitted grid would be
+        fit_width = int(tile_width)
+        self.tile_width = max(fit_width, Game.MIN_TILE_WIDTH)
+
+        # Array containing all colors
+        self.num_colors = num_colors if num_colors is not None else Game.NUM_COLORS
+        self.colors = [Game.Color(hsv) for hsv in Game.get_new_colors(self.num_colors)]
+        self.assign_letters()
 
         # Cuts the map list if there are more maps than available tiles
+        # When given a coverage target, helper words are picked so that that fraction of tiles contain every color
         if len(maps) > total_tiles:
             maps = maps[:total_tiles]
-            words = list(maps)
+            tile_words = list(maps)
+        elif len(maps) < total_tiles and coverage_target is not None:
+            tile_words = list(maps) + self.get_coverage_words(maps, total_tiles - len(maps), coverage_target)
         elif len(maps) < total_tiles:
-            words = list(maps) + [word_gen_func() for _ in range(total_tiles - len(maps))]
+            tile_words = list(maps) + [word_gen_func() for _ in range(total_tiles - len(maps))]
         else:
-            words = list(maps)
-        random.shuffle(words)
+            tile_words = list(maps)
+        random.shuffle(tile_words)
 
         # All words and maps
-        self.words = words
+        self.words = tile_words
         self.maps = maps
 
         # Game window
-        self.screen = pygame.display.set_mode(
-            (int(self.tile_width * self.grid_dims[0] * (1 + Game.SPACE_BETWEEN_TILES)) + Game.EXTEND_RIGHT + Game.INITIAL_X_TILE_OFFSET,
-             int(self.tile_width * self.grid_dims[1] * (1 + Game.SPACE_BETWEEN_TILES)) + Game.EXTEND_DOWN + Game.INITIAL_Y_TILE_OFFSET),
-            pygame.DOUBLEBUF)
+        viewport_size = (int(fit_width * self.grid_dims[0] * (1 + Game.SPACE_BETWEEN_TILES)) + Game.INITIAL_X_TILE_OFFSET,
+                         int(fit_width * self.grid_dims[1] * (1 + Game.SPACE_BETWEEN_TILES)) + Game.INITIAL_Y_TILE_OFFSET)
+        self.screen = pygame.display.set_mode((viewport_size[0] + Game.EXTEND_RIGHT, viewport_size[1] + Game.EXTEND_DOWN),
+                                              pygame.DOUBLEBUF)
 
-        # Array containing all colors
-        self.colors = []
-        diff_range = const.get_max_diff_range(0.95, Game.NUM_COLORS)
-        for _ in range(Game.NUM_COLORS):
-            self.colors.append(Game.Color(Game.get_new_color(self.colors, diff_range)))
-        self.assign_letters()
+        # What part of the board is shown in the viewport, starting zoomed out to show all of it
+        self.camera = camera.Camera(((0, 0), viewport_size),
+                                    (int(self.tile_width * self.grid_dims[0] * (1 + Game.SPACE_BETWEEN_TILES)) + Game.INITIAL_X_TILE_OFFSET,
+                                     int(self.tile_width * self.grid_dims[1] * (1 + Game.SPACE_BETWEEN_TILES)) + Game.INITIAL_Y_TILE_OFFSET))
+        # Held arrow keys keep panning
+        pygame.key.set_repeat(Game.KEY_REPEAT_DELAY, Game.KEY_REPEAT_INTERVAL)
+
+        # Rendered letters and words shared by all tiles
+        self.glyph_atlas = sprites.GlyphAtlas()
+
+        # Tiles that changed since they were last drawn
+        self.dirty_tiles = []
 
         # Generates tiles based on given csgo maps and additional helper words
         self.TILES = [sprites.Tile((sprites.Tile.TILE_TYPES.MAP if (word in maps) else sprites.Tile.TILE_TYPES.HELPER), self.tile_width, word,
                                    (Game.INITIAL_X_TILE_OFFSET + (self.tile_width + (Game.SPACE_BETWEEN_TILES*self.tile_width)) * (idx % self.grid_dims[0]) + self.tile_width/2,
-                                    Game.INITIAL_Y_TILE_OFFSET + (self.tile_width + (Game.SPACE_BETWEEN_TILES*self.tile_width)) * (idx // self.grid_dims[0]) + self.tile_width/2), self) for idx, word in enumerate(words)]
+                                    Game.INITIAL_Y_TILE_OFFSET + (self.tile_width + (Game.SPACE_BETWEEN_TILES*self.tile_width)) * (idx // self.grid_dims[0]) + self.tile_width/2), self) for idx, word in enumerate(tile_words)]
 
         # Prints the % of all tiles which have all the colors on them
         print(str(round((len([t for t in self.TILES if len(t.all_colors) == len(self.colors)]) / len(self.TILES)) * 100, 1)) + "%")
@@ -115,19 +181,15 @@ class Game:
         self.word_list_surface = self.render_word_list()
         self.letter_display_surface = self.render_letter_display()
 
-        # Surface for drawing annotations over the screen
-        self.annotation_surf = pygame.Surface((self.screen.get_rect().width, self.screen.get_rect().height), pygame.SRCALPHA, 32).convert_alpha()
+        # Pen and eraser strokes drawn over the screen
+        self.annotations = annotations.AnnotationLayer(self.screen.get_size(), Game.ERASER_RADIUS)
 
         # Set this flag to update the displays
         self.do_update_displays = False
         self.newly_revealed_tile = None
 
-        # Flag to determine if pen is drawing
-        self.is_drawing = False
-        self.previous_draw_point = [0, 0]
-        self.eraser_brush = pygame.Surface((Game.ERASER_RADIUS*2, Game.ERASER_RADIUS*2), pygame.SRCALPHA, 32)
-        pygame.draw.circle(self.eraser_brush, (0, 0, 0), (Game.ERASER_RADIUS, Game.ERASER_RADIUS), Game.ERASER_RADIUS)
-        self.eraser_brush = self.eraser_brush.convert_alpha()
+        # Kind of stroke being drawn (AnnotationLayer.PEN or ERASER), None if the pen is up
+        self.stroke_kind = None
 
         self.draw_line_width = 4
         self.draw_color = (255, 0, 0)
@@ -150,6 +212,16 @@ class Game:
         self.map_choice_next_text = None
         self.update_map_elimination()
 
+        # Draws the board and HUD layers, pushing only what changed to the screen
+        self.renderer = renderer.LayeredRenderer(self)
+        self.clock = pygame.time.Clock()
+
+        # Tiles whose surfaces haven't all been built yet for the zoom level in warm_level, warmed a few at a time
+        # between frames
+        self.cold_tiles = []
+        self.warm_level = None
+        self.queue_warm_up()
+
     def update_map_elimination(self):
         revealed_maps = [t.word for t in self.TILES if t.tile_type == sprites.Tile.TILE_TYPES.MAP and not t.is_revealed]
 
@@ -167,40 +239,123 @@ class Game:
         # Transparency
         self.map_choice_next_text.fill((0, 150, 0, 100), None, pygame.BLEND_RGBA_MULT)
 
+    def get_coverage_words(self, maps, count, coverage_target):
+        """Picks count helper words so that about coverage_target of all tiles (maps included) have every color"""
+        table = words.CoverageTable(const.get_word_index(), [col.letter_mask for col in self.colors])
+
+        full_maps = len([m for m in maps if table.get_signature(m) == table.all_groups])
+        full_count = min(max(round(coverage_target * (len(maps) + count)) - full_maps, 0), count)
+
+        # Falls back to a random word if the list has nothing that fits
+        return [table.pick(table.all_groups) or self.word_gen_fun() for _ in range(full_count)] + \
+               [table.pick(partial=True) or self.word_gen_fun() for _ in range(count - full_count)]
+
+    def move_camera(self, key):
+        """Pans or zooms for a key press. Returns whether the view changed"""
+        step = (self.camera.viewport.width * camera.Camera.PAN_FRACTION,
+                self.camera.viewport.height * camera.Camera.PAN_FRACTION)
+        if key == pygame.K_LEFT:
+            return self.camera.pan(-step[0], 0)
+        elif key == pygame.K_RIGHT:
+            return self.camera.pan(step[0], 0)
+        elif key == pygame.K_UP:
+            return self.camera.pan(0, -step[1])
+        elif key == pygame.K_DOWN:
+            return self.camera.pan(0, step[1])
+        # Zooms around the mouse
+        elif key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+            return self.camera.zoom_by(1, self.frame_input.mouse_pos)
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            return self.camera.zoom_by(-1, self.frame_input.mouse_pos)
+        elif key == pygame.K_HOME:
+            return self.camera.reset()
+        return False
+
+    def get_tile_at(self, pos):
+        """Gets the tile under a screen position straight from the grid layout, or None if there isn't one"""
+        if not self.camera.viewport.collidepoint(pos):
+            return None
+        pos = self.camera.to_board(pos)
+        pitch = self.tile_width * (1 + Game.SPACE_BETWEEN_TILES)
+
+        # Tile rects are rounded to whole pixels, so a point within a pixel of a cell's edge may belong to either side
+        cols = set([int((pos[0] - Game.INITIAL_X_TILE_OFFSET + shift) // pitch) for shift in (-1, 1)])
+        rows = set([int((pos[1] - Game.INITIAL_Y_TILE_OFFSET + shift) // pitch) for shift in (-1, 1)])
+        for row in rows:
+            for col in cols:
+                if 0 <= col < self.grid_dims[0] and 0 <= row < self.grid_dims[1]:
+                    tile = self.TILES[row * self.grid_dims[0] + col]
+                    if tile.physics_body.collidepoint(pos):
+                        return tile
+        return None
+
+    def get_tiles_in(self, rect):
+        """Gets the tiles whose bounds overlap a board rect, only looking at the grid cells around it"""
+        pitch = self.tile_width * (1 + Game.SPACE_BETWEEN_TILES)
+        first_col = max(int((rect.left - Game.INITIAL_X_TILE_OFFSET) // pitch) - 1, 0)
+        last_col = min(int((rect.right - Game.INITIAL_X_TILE_OFFSET) // pitch) + 1, self.grid_dims[0] - 1)
+        first_row = max(int((rect.top - Game.INITIAL_Y_TILE_OFFSET) // pitch) - 1, 0)
+        last_row = min(int((rect.bottom - Game.INITIAL_Y_TILE_OFFSET) // pitch) + 1, self.grid_dims[1] - 1)
+
+        return [self.TILES[row * self.grid_dims[0] + col] for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)
+                if self.TILES[row * self.grid_dims[0] + col].get_bounds().colliderect(rect)]
+
+    def get_hud_blits(self):
+        """Gets the HUD surfaces along with where they go on screen"""
+        blits = [(self.word_list_surface,
+                  self.word_list_surface.get_rect(topleft=(
+                      self.screen.get_width() - self.word_list_surface.get_width() - Game.INITIAL_X_TILE_OFFSET*.25,
+                      Game.INITIAL_Y_TILE_OFFSET))),
+                 (self.letter_display_surface,
+                  self.letter_display_surface.get_rect(center=(self.screen.get_width()/2,
+                                                               self.screen.get_height() - Game.EXTEND_DOWN/2)))]
+
+        # Eliminating feature
+        DIST_FROM_BOTTOM = self.ELIMINATING_TEXT.get_height() + 0.2 * Game.EXTEND_DOWN
+        MAP_TEXT_WIDTH = self.map_choice_text.get_width()
+        ELIMINATING_TEXT_WIDTH = self.ELIMINATING_TEXT.get_width()
+        MARGIN_BETWEEN_TEXT = 0.05 * self.EXTEND_RIGHT
+
+        blits.append((self.ELIMINATING_TEXT,
+                      self.ELIMINATING_TEXT.get_rect(topleft=(
+                          self.screen.get_width() - MARGIN_BETWEEN_TEXT*2 - ELIMINATING_TEXT_WIDTH - MAP_TEXT_WIDTH,
+                          self.screen.get_height() - DIST_FROM_BOTTOM))))
+        blits.append((self.map_choice_text,
+                      self.map_choice_text.get_rect(topleft=(self.screen.get_width() - MARGIN_BETWEEN_TEXT - MAP_TEXT_WIDTH,
+                                                             self.screen.get_height() - DIST_FROM_BOTTOM))))
+        blits.append((self.map_choice_next_text, self.map_choice_next_text.get_rect(center=(
+            self.screen.get_width() - MARGIN_BETWEEN_TEXT - MAP_TEXT_WIDTH/2,
+            self.screen.get_height() - DIST_FROM_BOTTOM / 2))))
+
+        return blits
+
     def update_revealed_letters(self, word):
+        mask = words.get_letter_mask(word)
         for col in self.colors:
-            col.reveal_letters(word)
+            if mask & col.letter_mask & ~col.revealed_mask:
+                col.reveal_letters(word)
 
     @staticmethod
-    def get_new_color(colors, diff_range=.1):
-        """Gets a new color that has an hsv difference of the given range"""
-
-        # Guilty
-        valid = False
-        while not valid:
-            new_col = (random.randint(0, 1000) / 1000, random.randint(90, 100)/100, random.randint(50, 90)/100)
-
-            # Innocent until proven guilty
-            valid = True
-            for c in colors:
-                # if the color difference is too small, choose another one by setting flag to guilty
-                if abs(new_col[0] - c.hsv[0]) < diff_range or new_col[0] > 0.9:
-                    valid = False
-
-        return new_col
+    def get_new_colors(num_colors):
+        """Gets num_colors colors with evenly spread out hues"""
+        return [(hue, random.randint(90, 100)/100, random.randint(50, 90)/100) for hue in const.get_hues(num_colors)]
 
     def get_letter_color(self, letter):
-        for col in self.colors:
-            if letter.lower() in col.letters.lower():
-                return col
+        letter = letter.lower()
+        if "a" <= letter <= "z" and self.letter_colors[ord(letter) - 97] is not None:
+            return self.letter_colors[ord(letter) - 97]
         return -1
 
     def assign_letters(self):
         alph = [i for i in "abcdefghijklmnopqrstuvwxyz"]
+        # Color of each letter, indexed by its position in the alphabet
+        self.letter_colors = [None] * 26
         while 1:
             for col in self.colors:
                 rand_letter_idx = random.randint(0, len(alph) - 1)
                 col.assign_letter(alph[rand_letter_idx])
+                self.letter_colors[ord(alph[rand_letter_idx]) - 97] = col
                 alph.pop(rand_letter_idx)
                 if not len(alph):
                     break
@@ -208,6 +363,7 @@ class Game:
                 break
 
     def render_letter_display(self):
+        """Builds the color panel, caching the layout of each row so update_letter_display can redraw single rows"""
         SURF_HEIGHT = Game.EXTEND_DOWN * min(.1*len(self.colors) + 0.3, 1)
 
         letter_display_surf = pygame.Surface((self.screen.get_width(), SURF_HEIGHT), pygame.SRCALPHA,
@@ -220,29 +376,65 @@ class Game:
         COLOR_CIRCLE_RADIUS = PER_COLOR_DISPLAY_HEIGHT / 2
 
         FONT_SIZE = PER_COLOR_DISPLAY_HEIGHT * 0.9
-        FONT = const.get_gui_font(FONT_SIZE)
+        self.letter_display_font = const.get_gui_font(FONT_SIZE)
 
+        # Each row as [top, circle radius, letters shown, letter surface, letter rect]
+        self.letter_display_rows = []
         y_draw_cursor = 0
-        for col in self.colors:
-            # Draws circle
-            pygame.draw.circle(letter_display_surf, col.rgb, (COLOR_CIRCLE_RADIUS, y_draw_cursor + COLOR_CIRCLE_RADIUS), COLOR_CIRCLE_RADIUS)
-            # Draws letters
-            if not len(col.revealed_letters):
-                letters = "?"
-            else:
-                letters = "".join([i + (", " if idx < len(col.revealed_letters) - 1 else "") for idx, i in enumerate(col.revealed_letters)]) + (", ?" if len(col.letters) > len(col.revealed_letters) else "")
-            rendered = FONT.render(letters, True, col.rgb)
-
-            letter_display_surf.blit(rendered, (COLOR_CIRCLE_RADIUS*2 + 10, y_draw_cursor + rendered.get_height()/2))
-
+        for _ in self.colors:
+            self.letter_display_rows.append([y_draw_cursor, COLOR_CIRCLE_RADIUS, None, None, None])
             y_draw_cursor += PER_COLOR_DISPLAY_HEIGHT + MARGIN_BETWEEN_COL
 
+        for idx in range(len(self.colors)):
+            self.render_letter_row(idx)
+        for idx in range(len(self.colors)):
+            self.draw_letter_row(letter_display_surf, idx)
+
         return letter_display_surf.convert_alpha()
 
+    # Renders the letters of a color row if they changed. Returns the area the row's letters used to cover and now
+    # cover, or None if nothing changed
+    def render_letter_row(self, row_idx):
+        col = self.colors[row_idx]
+        row = self.letter_display_rows[row_idx]
+        if not len(col.revealed_letters):
+            letters = "?"
+        else:
+            letters = "".join([i + (", " if idx < len(col.revealed_letters) - 1 else "") for idx, i in enumerate(col.revealed_letters)]) + (", ?" if len(col.letters) > len(col.revealed_letters) else "")
+        if letters == row[2]:
+            return None
+
+        old_rect = row[4]
+        rendered = self.letter_display_font.render(letters, True, col.rgb)
+        row[2], row[3] = letters, rendered
+        # Blits truncate float positions, while Rect attributes would round them
+        row[4] = pygame.Rect((int(row[1]*2 + 10), int(row[0] + rendered.get_height()/2)), rendered.get_size())
+        return row[4] if old_rect is None else row[4].union(old_rect)
+
+    def draw_letter_row(self, surf, idx):
+        top, radius, _, rendered, rect = self.letter_display_rows[idx]
+        pygame.draw.circle(surf, self.colors[idx].rgb, (radius, top + radius), radius)
+        surf.blit(rendered, rect)
+
+    def update_letter_display(self):
+        """Redraws the color rows whose revealed letters changed, along with any rows overlapping them (letters hang
+        below their own row). Returns the changed areas of the panel"""
+        changed = [rect for rect in [self.render_letter_row(idx) for idx in range(len(self.colors))] if rect is not None]
+        for rect in changed:
+            self.letter_display_surface.set_clip(rect)
+            self.letter_display_surface.fill((0, 0, 0, 0), rect)
+            for idx, row in enumerate(self.letter_display_rows):
+                circle_rect = pygame.Rect(0, row[0], row[1]*2, row[1]*2).inflate(2, 2)
+                if circle_rect.colliderect(rect) or row[4].colliderect(rect):
+                    self.draw_letter_row(self.letter_display_surface, idx)
+            self.letter_display_surface.set_clip(None)
+        return changed
+
     def render_word_list(self):
+        """Builds the word list, caching the position of each word's row so update_word_list can redraw single rows"""
         # Prepares assets and dimensions
         FONT_SIZE = self.tile_width * 0.25
-        FONT = const.get_gui_font(FONT_SIZE)
+        self.word_list_font = FONT = const.get_gui_font(FONT_SIZE)
 
         title_text = FONT.render("WORDS", True, (0, 0, 0))
 
@@ -250,10 +442,11 @@ class Game:
         LINE_MARGIN = 10
 
         WORD_MARGIN = 5
-        TOTAL_WORD_HEIGHT = sum([FONT.size(t.word)[1] + WORD_MARGIN for t in self.TILES])
+        word_sizes = [FONT.size(t.word) for t in self.TILES]
+        TOTAL_WORD_HEIGHT = sum([size[1] + WORD_MARGIN for size in word_sizes])
 
         SURFACE_HEIGHT = TOTAL_WORD_HEIGHT + LINE_MARGIN*2 + LINE_WIDTH + title_text.get_height()
-        SURFACE_WIDTH = max([FONT.size(t.word)[0] for t in self.TILES])*1.1
+        SURFACE_WIDTH = max([size[0] for size in word_sizes])*1.1
 
         # Generates Surface
         word_list_surf = pygame.Surface((SURFACE_WIDTH, SURFACE_HEIGHT),
@@ -268,120 +461,196 @@ class Game:
                          (0, draw_cursor + LINE_MARGIN), (SURFACE_WIDTH, draw_cursor + LINE_MARGIN), LINE_WIDTH)
         draw_cursor += LINE_MARGIN*2 + LINE_WIDTH
 
-        for tile in self.TILES:
-            word_rendering = FONT.render(tile.word, True, (80, 80, 80) if tile.tile_type == sprites.Tile.TILE_TYPES.HELPER else (200, 0, 200), (255, 255, 150) if tile.is_revealed else None)
-            word_list_surf.blit(word_rendering,
-                                word_rendering.get_rect(center=(SURFACE_WIDTH/2,
-                                                                draw_cursor + word_rendering.get_height()/2)))
-            draw_cursor += word_rendering.get_height() + WORD_MARGIN
+        # Each word's row as [area on the surface, whether it was drawn revealed]
+        self.word_list_center_x = SURFACE_WIDTH/2
+        self.word_list_rows = []
+        for size in word_sizes:
+            # Centering rounds, so the row can sit a pixel below the draw cursor
+            word_rect = pygame.Rect((0, 0), size)
+            word_rect.center = (SURFACE_WIDTH/2, draw_cursor + size[1]/2)
+            self.word_list_rows.append([pygame.Rect(0, word_rect.top, word_list_surf.get_width(), size[1]), None])
+            draw_cursor += size[1] + WORD_MARGIN
+
+        for idx in range(len(self.TILES)):
+            self.render_word_row(word_list_surf, idx)
 
         return word_list_surf.convert_alpha()
 
+    # Redraws a word's row if its tile was revealed since. Returns the row's area, or None if nothing changed
+    def render_word_row(self, surf, idx):
+        tile = self.TILES[idx]
+        rect, drawn_revealed = self.word_list_rows[idx]
+        if drawn_revealed == tile.is_revealed:
+            return None
+
+        word_rendering = self.word_list_font.render(tile.word, True, (80, 80, 80) if tile.tile_type == sprites.Tile.TILE_TYPES.HELPER else (200, 0, 200), (255, 255, 150) if tile.is_revealed else None)
+        surf.fill((0, 0, 0, 0), rect)
+        surf.blit(word_rendering, word_rendering.get_rect(centerx=self.word_list_center_x, top=rect.top))
+        self.word_list_rows[idx][1] = tile.is_revealed
+        return rect
+
+    def update_word_list(self):
+        """Redraws the rows of words revealed since the last update. Returns the changed areas of the list"""
+        changed = [self.render_word_row(self.word_list_surface, idx) for idx in range(len(self.TILES))]
+        return [rect for rect in changed if rect is not None]
+
     def update_displays(self):
+        # Clears the old elimination panel. The word list and color panel only get their changed rows pushed
+        hud_blits = self.get_hud_blits()
+        for _, rect in hud_blits[2:]:
+            self.renderer.mark_dirty(rect)
+
         # Eliminates tile if invalid
         if self.newly_revealed_tile.tile_type == sprites.Tile.TILE_TYPES.MAP:
             if self.newly_revealed_tile.word != self.map_choice:
                 self.newly_revealed_tile.is_eliminated = True
+                self.dirty_tiles.append(self.newly_revealed_tile)
 
-        self.word_list_surface = self.render_word_list()
-        self.letter_display_surface = self.render_letter_display()
+        for (_, hud_rect), changed in zip(hud_blits, (self.update_word_list(), self.update_letter_display())):
+            for rect in changed:
+                self.renderer.mark_dirty(rect.move(hud_rect.topleft))
         self.update_map_elimination()
 
-    def run_game(self):
-        while self.running:
-            if self.do_update_displays:
-                self.update_displays()
-
-                self.do_update_displays = False
-
-            # Clears screen
-            self.screen.fill((255, 255, 255))
-
-            # Updates events and checks for quit
-            self.events = pygame.event.get()
-            for event in self.events:
-                if event.type == pygame.QUIT:
-                    self.running = False
-                # Allows brush size changes
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == pygame.BUTTON_WHEELUP:
-                        self.draw_line_width = min(self.draw_line_width + 1, 20)
-                    elif event.button == pygame.BUTTON_WHEELDOWN:
-                        self.draw_line_width = max(self.draw_line_width - 1, 1)
-
-            # Runs tiles and annotations
-            for t in self.TILES:
-                t.run_sprite(self.screen, self)
-
-            # Eraser Functionality
-            if pygame.key.get_pressed()[pygame.K_LSHIFT]:
-                pygame.draw.circle(self.screen, (150, 150, 150), pygame.mouse.get_pos(), Game.ERASER_RADIUS, 1)
-            else:
-                mp = pygame.mouse.get_pos()
-                pygame.draw.rect(self.screen, (150, 150, 150), pygame.Rect(mp[0] - self.draw_line_width/2,
-                                                                           mp[1] - self.draw_line_width/2,
-                                                                           self.draw_line_width,
-                                                                           self.draw_line_width), 1)
-
-            if pygame.mouse.get_pressed(3)[0] and pygame.key.get_pressed()[pygame.K_LSHIFT]:
-                self.annotation_surf.blit(self.eraser_brush, self.eraser_brush.get_rect(center=pygame.mouse.get_pos()), None, pygame.BLEND_RGBA_SUB)
+        for _, rect in self.get_hud_blits()[2:]:
+            self.renderer.mark_dirty(rect)
 
-            # Manages Drawing functionality
-            elif pygame.mouse.get_pressed(3)[0]:
-                if not self.is_drawing:
-                    self.previous_draw_point = pygame.mouse.get_pos()
-                else:
-                    prev_pt = self.previous_draw_point
-                    cur_pt = pygame.mouse.get_pos()
+    # Nothing is moving, so the game can wait for input
+    def is_idle(self):
+        return not (self.do_update_displays or self.dirty_tiles or self.frame_input.left_pressed or self.cold_tiles)
 
-                    pygame.draw.line(self.annotation_surf, self.draw_color, prev_pt, cur_pt, self.draw_line_width)
+    # Marks every tile cold for the current zoom level. Reversed so popping goes in board order. The low resolution
+    # board is drawn without any tile surfaces, so there's nothing to warm at those levels
+    def queue_warm_up(self):
+        self.warm_level = self.camera.level
+        self.cold_tiles = [] if self.renderer.is_lod() else self.TILES[::-1]
 
-                    self.previous_draw_point = cur_pt
+    # Builds the surfaces of cold tiles until the budget (in milliseconds) runs out
+    def warm_tiles(self, budget):
+        end = time.perf_counter() + budget / 1000
+        while self.cold_tiles and time.perf_counter() < end:
+            self.cold_tiles.pop().warm(self)
 
-                self.is_drawing = True
+    def run_game(self):
+        self.renderer.draw_board()
+        while self.running:
+            self.run_frame()
+        profiler.PROFILER.finish()
+
+    def run_frame(self):
+        # Reads the frame's input, sleeping until the next event while idle. The wait isn't part of the frame's timings
+        profiler.PROFILER.begin("wait")
+        self.frame_input = self.input.get_frame(self.is_idle())
+        self.events = self.frame_input.events
+        profiler.PROFILER.end("wait")
+
+        profiler.PROFILER.begin("frame")
+        if self.do_update_displays:
+            profiler.PROFILER.begin("hud")
+            self.update_displays()
+            profiler.PROFILER.end("hud")
+
+            self.do_update_displays = False
+
+        # Updates events and checks for quit
+        profiler.PROFILER.begin("events")
+        for event in self.events:
+            if event.type == pygame.QUIT:
+                self.running = False
+            # Window was uncovered, so everything needs pushing again
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.renderer.mark_dirty(self.screen.get_rect())
+            # Allows brush size changes
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == pygame.BUTTON_WHEELUP:
+                    self.draw_line_width = min(self.draw_line_width + 1, 20)
+                elif event.button == pygame.BUTTON_WHEELDOWN:
+                    self.draw_line_width = max(self.draw_line_width - 1, 1)
+
+                # Hands the click to the tile under it, if any
+                tile = self.get_tile_at(event.pos)
+                if tile is not None:
+                    tile.on_click(event, self)
+            # Ctrl+Z/Ctrl+Y undo and redo annotations, Delete clears them
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                    self.annotations.undo()
+                elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                    self.annotations.redo()
+                elif event.key == pygame.K_DELETE:
+                    self.annotations.clear()
+                elif event.key == profiler.OVERLAY_TOGGLE_KEY:
+                    profiler.PROFILER.toggle_overlay()
+                    self.renderer.draw_overlay(None)
+                elif self.move_camera(event.key):
+                    # Tiles only keep surfaces for one size, so a new zoom level makes them all cold again
+                    if self.camera.level != self.warm_level:
+                        self.queue_warm_up()
+                    self.renderer.draw_view()
+        profiler.PROFILER.end("events")
+
+        # Redraws tiles that were revealed or eliminated
+        profiler.PROFILER.begin("tiles")
+        for t in self.dirty_tiles:
+            self.renderer.redraw_tile(t)
+        self.dirty_tiles = []
+        profiler.PROFILER.end("tiles")
+
+        mp = self.frame_input.mouse_pos
+
+        # Eraser and pen functionality. Every frame the mouse is held extends the current stroke
+        profiler.PROFILER.begin("pen")
+        if self.frame_input.left_pressed:
+            kind = annotations.AnnotationLayer.ERASER if self.frame_input.shift_pressed else annotations.AnnotationLayer.PEN
+            if self.stroke_kind != kind:
+                self.annotations.begin_stroke(kind, self.draw_color, self.draw_line_width, mp)
+                self.stroke_kind = kind
             else:
-                self.is_drawing = False
-
-            """ DISPLAY COLORS
-            posx = 25
-            for c in self.colors:
-                pygame.draw.circle(self.screen, c.rgb, (posx, 50), 10)
-                posx += 50
-            """
-
-            # Displays All Words
-            self.screen.blit(self.word_list_surface,
-                             self.word_list_surface.get_rect(topleft=(
-                                 self.screen.get_width() - self.word_list_surface.get_width() - Game.INITIAL_X_TILE_OFFSET*.25,
-                                 Game.INITIAL_Y_TILE_OFFSET)))
-
-            self.screen.blit(self.letter_display_surface, self.letter_display_surface.get_rect(center=(self.screen.get_width()/2,
-                                                                                                       self.screen.get_height() - Game.EXTEND_DOWN/2)))
-
-            # Displays eliminating feature
-            DIST_FROM_BOTTOM = self.ELIMINATING_TEXT.get_height() + 0.2 * Game.EXTEND_DOWN
-            MAP_TEXT_WIDTH = self.map_choice_text.get_width()
-            ELIMINATING_TEXT_WIDTH = self.ELIMINATING_TEXT.get_width()
-            MARGIN_BETWEEN_TEXT = 0.05 * self.EXTEND_RIGHT
-
-            self.screen.blit(self.ELIMINATING_TEXT, (self.screen.get_width() - MARGIN_BETWEEN_TEXT*2 - ELIMINATING_TEXT_WIDTH - MAP_TEXT_WIDTH,
-                                                     self.screen.get_height() - DIST_FROM_BOTTOM))
-            self.screen.blit(self.map_choice_text, (self.screen.get_width() - MARGIN_BETWEEN_TEXT - MAP_TEXT_WIDTH,
-                                                    self.screen.get_height() - DIST_FROM_BOTTOM))
-            self.screen.blit(self.map_choice_next_text, self.map_choice_next_text.get_rect(center=(
-                self.screen.get_width() - MARGIN_BETWEEN_TEXT - MAP_TEXT_WIDTH/2,
-                self.screen.get_height() - DIST_FROM_BOTTOM / 2
-            )))
-
-            # Displays annotations
-            self.screen.blit(self.annotation_surf, (0, 0))
-
-            # Changes pen color based on clicked pixel
-            for event in self.events:
-                if event.type == pygame.MOUSEBUTTONDOWN and event.button == pygame.BUTTON_MIDDLE:
-                    sample = self.screen.get_at(event.pos)
-                    if sample != (255, 255, 255, 255):
-                        self.draw_color = sample
-
-            # Updates display
-            pygame.display.update()
+                self.annotations.add_point(mp)
+        elif self.stroke_kind is not None:
+            self.annotations.end_stroke()
+            self.stroke_kind = None
+
+        for rect in self.annotations.collect_dirty_rects():
+            self.renderer.mark_dirty(rect)
+        profiler.PROFILER.end("pen")
+
+        """ DISPLAY COLORS
+        posx = 25
+        for c in self.colors:
+            pygame.draw.circle(self.screen, c.rgb, (posx, 50), 10)
+            posx += 50
+        """
+
+        # Cursor shows the eraser or the brush size
+        if self.frame_input.shift_pressed:
+            self.renderer.draw_cursor(pygame.Rect(mp[0] - Game.ERASER_RADIUS, mp[1] - Game.ERASER_RADIUS,
+                                                  Game.ERASER_RADIUS * 2, Game.ERASER_RADIUS * 2),
+                                      lambda screen: pygame.draw.circle(screen, (150, 150, 150), mp, Game.ERASER_RADIUS, 1))
+        else:
+            brush_rect = pygame.Rect(mp[0] - self.draw_line_width/2, mp[1] - self.draw_line_width/2,
+                                     self.draw_line_width, self.draw_line_width)
+            self.renderer.draw_cursor(brush_rect,
+                                      lambda screen: pygame.draw.rect(screen, (150, 150, 150), brush_rect, 1))
+
+        # Changes pen color based on clicked pixel
+        for event in self.events:
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == pygame.BUTTON_MIDDLE:
+                sample = self.renderer.sample(event.pos)
+                if sample != (255, 255, 255, 255):
+                    self.draw_color = sample
+
+        # Shows the profiler's timings so far over everything
+        if profiler.PROFILER.overlay_visible:
+            self.renderer.draw_overlay(profiler.PROFILER.render_overlay())
+
+        # Updates display
+        self.renderer.present()
+
+        # Uses what's left of the frame to get tiles ready before they're revealed
+        if self.cold_tiles:
+            profiler.PROFILER.begin("warm")
+            self.warm_tiles(Game.WARM_UP_BUDGET)
+            profiler.PROFILER.end("warm")
+        profiler.PROFILER.end("frame")
+        profiler.PROFILER.end_frame()
+        self.clock.tick(self.MAX_FPS)
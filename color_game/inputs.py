@@ -0,0 +1,24 @@
+import pygame
+
+
+class FrameInput:
+    """Everything the game reads from the player in one frame: the events along with the mouse and shift key state"""
+
+    __slots__ = ("events", "mouse_pos", "left_pressed", "shift_pressed")
+
+    def __init__(self, events=(), mouse_pos=(0, 0), left_pressed=False, shift_pressed=False):
+        self.events = list(events)
+        self.mouse_pos = tuple(mouse_pos)
+        self.left_pressed = left_pressed
+        self.shift_pressed = shift_pressed
+
+
+class LiveInput:
+    """Reads input straight from pygame"""
+
+    def get_frame(self, wait=False):
+        """Gets the input for the next frame. With wait set, sleeps until there's at least one event"""
+        events = [pygame.event.wait()] if wait else []
+        events += pygame.event.get()
+        return FrameInput(events, pygame.mouse.get_pos(), pygame.mouse.get_pressed(3)[0],
+                          pygame.key.get_pressed()[pygame.K_LSHIFT])
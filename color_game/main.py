@@ -1,6 +1,12 @@
+import os
+import sys
 import pygame
 import math
 import random
+
+# The profiler is shared with map_grid.py, so it lives in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import const
 import game
 
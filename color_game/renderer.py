@@ -0,0 +1,171 @@
+import math
+
+import pygame
+import profiler
+
+
+class LayeredRenderer:
+    """Draws the game in layers. The board (background and tiles) is cached in its own surface and only the tiles that
+    changed get redrawn into it. HUD surfaces, annotations and the cursor go over the board, but only inside the screen
+    regions marked dirty, and only those regions get pushed to the display.
+
+    The board layer holds what the game's camera sees: only tiles inside its viewport get drawn. Zoomed out far enough
+    that tiles would be smaller than LOD_TILE_WIDTH, the view is scaled down from a cached low resolution image of the
+    whole board instead"""
+
+    BACKGROUND_COLOR = (255, 255, 255)
+
+    # Width of a tile in the low resolution board image, and the on screen width under which it gets used
+    LOD_TILE_WIDTH = 24
+
+    def __init__(self, game):
+        self.game = game
+        self.screen = game.screen
+
+        # Cached board layer
+        self.board = pygame.Surface(self.screen.get_size()).convert()
+
+        # Low resolution image of the whole board, built the first time the camera zooms out far enough
+        self.lod_scale = LayeredRenderer.LOD_TILE_WIDTH / self.game.tile_width
+        self.lod = None
+
+        # Screen regions that need to be recomposited and pushed this frame
+        self.dirty_rects = []
+
+        # Where the cursor was last drawn and the function drawing it
+        self.cursor_rect = None
+        self.cursor_draw_func = None
+
+        # Profiler overlay drawn over everything, if shown
+        self.overlay_surf = None
+        self.overlay_rect = None
+
+    def mark_dirty(self, rect):
+        rect = pygame.Rect(rect).clip(self.screen.get_rect())
+        if rect.width and rect.height:
+            self.dirty_rects.append(rect)
+
+    def draw_board(self):
+        self.board.fill(LayeredRenderer.BACKGROUND_COLOR)
+        self.draw_view()
+        self.mark_dirty(self.screen.get_rect())
+
+    def draw_view(self):
+        """Redraws the camera's viewport into the board, called whenever the camera moves"""
+        viewport = self.game.camera.viewport
+        self.draw_region(viewport)
+        self.mark_dirty(viewport)
+
+    def is_lod(self):
+        return self.game.tile_width * self.game.camera.zoom < LayeredRenderer.LOD_TILE_WIDTH
+
+    def get_lod(self):
+        if self.lod is None:
+            camera = self.game.camera
+            self.lod = pygame.Surface((int(camera.board_size[0] * self.lod_scale) + 1,
+                                       int(camera.board_size[1] * self.lod_scale) + 1)).convert()
+            self.lod.fill(LayeredRenderer.BACKGROUND_COLOR)
+            for t in self.game.TILES:
+                t.render_lod(self.lod, self.lod_scale)
+        return self.lod
+
+    # Redraws part of the viewport (a screen rect) into the board
+    def draw_region(self, rect):
+        camera = self.game.camera
+        rect = rect.clip(camera.viewport)
+        if not rect.width or not rect.height:
+            return
+
+        self.board.set_clip(rect)
+        self.board.fill(LayeredRenderer.BACKGROUND_COLOR, rect)
+        if self.is_lod():
+            # Scales down the part of the low resolution image under rect, from the image's pixel edges around it
+            lod = self.get_lod()
+            board_rect = camera.to_board_rect(rect)
+            lod_rect = pygame.Rect(int(board_rect.left * self.lod_scale), int(board_rect.top * self.lod_scale),
+                                   math.ceil(board_rect.width * self.lod_scale) + 1,
+                                   math.ceil(board_rect.height * self.lod_scale) + 1).clip(lod.get_rect())
+            if lod_rect.width and lod_rect.height:
+                left, top = camera.to_screen((lod_rect.left / self.lod_scale, lod_rect.top / self.lod_scale))
+                right, bottom = camera.to_screen((lod_rect.right / self.lod_scale, lod_rect.bottom / self.lod_scale))
+                size = (round(right) - round(left), round(bottom) - round(top))
+                if size[0] > 0 and size[1] > 0:
+                    self.board.blit(pygame.transform.scale(lod.subsurface(lod_rect), size), (round(left), round(top)))
+        else:
+            for t in self.game.get_tiles_in(camera.to_board_rect(rect)):
+                t.render(self.board, self.game)
+        self.board.set_clip(None)
+
+    # Redraws a tile into the board, along with the parts of any neighbours that overlap it
+    def redraw_tile(self, tile):
+        bounds = tile.get_bounds()
+        if self.lod is not None:
+            tile.render_lod(self.lod, self.lod_scale)
+
+        # Tiles outside the viewport get drawn when the camera comes to them. Zoomed out, the whole view is scaled again
+        # since separately scaled pieces wouldn't line up
+        bounds = self.game.camera.to_screen_rect(bounds).clip(self.game.camera.viewport)
+        if not bounds.width or not bounds.height:
+            return
+        elif self.is_lod():
+            self.draw_view()
+        else:
+            self.draw_region(bounds)
+            self.mark_dirty(bounds)
+
+    # Draws every layer except the cursor within a screen region
+    def compose(self, rect):
+        self.screen.set_clip(rect)
+        self.screen.blit(self.board, rect, rect)
+        for surf, surf_rect in self.game.get_hud_blits():
+            if surf_rect.colliderect(rect):
+                self.screen.blit(surf, surf_rect)
+        profiler.PROFILER.begin("annotations")
+        self.game.annotations.draw(self.screen, rect)
+        profiler.PROFILER.end("annotations")
+        self.screen.set_clip(None)
+
+    # Gets the color shown at a position, ignoring the cursor
+    def sample(self, pos):
+        self.compose(pygame.Rect(pos, (1, 1)))
+        self.mark_dirty(pygame.Rect(pos, (1, 1)))
+        return self.screen.get_at(pos)
+
+    def draw_cursor(self, rect, draw_func):
+        """Moves the cursor, draw_func draws it onto the screen inside rect"""
+        # Leaves room for outlines drawn on the edge of the rect
+        rect = pygame.Rect(rect).inflate(2, 2)
+        if self.cursor_rect != rect:
+            if self.cursor_rect is not None:
+                self.mark_dirty(self.cursor_rect)
+            self.mark_dirty(rect)
+        self.cursor_rect = rect
+        self.cursor_draw_func = draw_func
+
+    def draw_overlay(self, surf):
+        """Shows surf in the top left corner over every other layer, or removes the overlay if surf is None"""
+        if self.overlay_rect is not None:
+            self.mark_dirty(self.overlay_rect)
+        self.overlay_surf = surf
+        self.overlay_rect = surf.get_rect() if surf is not None else None
+        if self.overlay_rect is not None:
+            self.mark_dirty(self.overlay_rect)
+
+    def present(self):
+        """Recomposites the dirty regions, redraws the cursor over them and pushes them to the display"""
+        if not self.dirty_rects:
+            return
+
+        profiler.PROFILER.begin("compose")
+        for rect in self.dirty_rects:
+            self.compose(rect)
+        if self.cursor_rect is not None and self.cursor_rect.collidelist(self.dirty_rects) != -1:
+            self.cursor_draw_func(self.screen)
+        if self.overlay_surf is not None:
+            self.screen.blit(self.overlay_surf, self.overlay_rect)
+        profiler.PROFILER.end("compose")
+
+        profiler.PROFILER.begin("flip")
+        pygame.display.update(self.dirty_rects)
+        profiler.PROFILER.end("flip")
+        self.dirty_rects = []
@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+import pygame
+
+# The profiler is shared with map_grid.py, so it lives in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import const
+import game
+import inputs
+
+# Log layout: a header with everything needed to rebuild the same board, then one record per frame and an end record
+# holding a hash of the final state. All little endian
+MAGIC = b"CSRP"
+VERSION = 1
+
+# magic, version, seed, num colors, grid width and height, screen width and height, coverage target (NaN for none),
+# word list size, length of the map names that follow
+HEADER = struct.Struct("<4sBQBHHHHdII")
+
+RECORD_FRAME = 0
+RECORD_END = 1
+
+# record kind, event count, mouse x, mouse y, flags. Then the frame's events
+FRAME = struct.Struct("<BHhhB")
+FLAG_LEFT_PRESSED = 1
+FLAG_SHIFT_PRESSED = 2
+
+# Only the events the game reacts to are kept. Each starts with its code
+EVENT_CODE = struct.Struct("<B")
+EVENT_BUTTON = 1
+EVENT_KEY = 2
+EVENT_QUIT = 3
+EVENT_EXPOSE = 4
+BUTTON_PAYLOAD = struct.Struct("<Bhh")
+KEY_PAYLOAD = struct.Struct("<IH")
+
+# record kind, frame count, sha256 of the final state
+END = struct.Struct("<BI32s")
+
+
+def encode_event(event):
+    """Packs an event, or returns None if the game doesn't use it"""
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        return EVENT_CODE.pack(EVENT_BUTTON) + BUTTON_PAYLOAD.pack(event.button, *event.pos)
+    if event.type == pygame.KEYDOWN:
+        return EVENT_CODE.pack(EVENT_KEY) + KEY_PAYLOAD.pack(event.key, event.mod & 0xFFFF)
+    if event.type == pygame.QUIT:
+        return EVENT_CODE.pack(EVENT_QUIT)
+    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+        return EVENT_CODE.pack(EVENT_EXPOSE)
+    return None
+
+
+# Reads an event packed by encode_event at offset, returning it along with the offset past it
+def decode_event(data, offset):
+    code = EVENT_CODE.unpack_from(data, offset)[0]
+    offset += EVENT_CODE.size
+    if code == EVENT_BUTTON:
+        button, x, y = BUTTON_PAYLOAD.unpack_from(data, offset)
+        return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=button, pos=(x, y)), offset + BUTTON_PAYLOAD.size
+    if code == EVENT_KEY:
+        key, mod = KEY_PAYLOAD.unpack_from(data, offset)
+        return pygame.event.Event(pygame.KEYDOWN, key=key, mod=mod), offset + KEY_PAYLOAD.size
+    if code == EVENT_QUIT:
+        return pygame.event.Event(pygame.QUIT), offset
+    if code == EVENT_EXPOSE:
+        return pygame.event.Event(pygame.WINDOWEXPOSED), offset
+    raise ValueError("unknown event code " + str(code) + " in replay log")
+
+
+def get_state_hash(game):
+    """Hashes everything input can change: tiles, revealed letters, the map being searched for, annotations and pen
+    settings"""
+    h = hashlib.sha256()
+    for t in game.TILES:
+        h.update(t.word.encode("utf-8") + struct.pack("<??", t.is_revealed, t.is_eliminated))
+    for col in game.colors:
+        h.update(col.revealed_letters.encode("utf-8") + b"|")
+    h.update(str((game.map_choice, game.map_choice_next)).encode("utf-8"))
+
+    layer = game.annotations
+    for arr in (layer.kinds, layer.colors, layer.widths, layer.starts, layer.lengths, layer.points):
+        h.update(arr.tobytes())
+    h.update(struct.pack("<4BH", *pygame.Color(game.draw_color), game.draw_line_width))
+    return h.digest()
+
+
+class RecordingInput:
+    """Hands out the frames of another input source while writing each one to a log file"""
+
+    def __init__(self, file, source):
+        self.file = file
+        self.source = source
+        self.frames = 0
+
+    def get_frame(self, wait=False):
+        frame = self.source.get_frame(wait)
+        events = [e for e in [encode_event(event) for event in frame.events] if e is not None]
+        flags = (FLAG_LEFT_PRESSED if frame.left_pressed else 0) | (FLAG_SHIFT_PRESSED if frame.shift_pressed else 0)
+        self.file.write(FRAME.pack(RECORD_FRAME, len(events), *frame.mouse_pos, flags) + b"".join(events))
+        self.frames += 1
+        return frame
+
+
+class ReplayInput:
+    """Hands out recorded frames, then closes the game once they run out"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.pos = 0
+
+    def get_frame(self, wait=False):
+        if self.pos >= len(self.frames):
+            return inputs.FrameInput([pygame.event.Event(pygame.QUIT)])
+        self.pos += 1
+        return self.frames[self.pos - 1]
+
+
+def load_log(path):
+    """Reads a log. Returns its header as a dict, the recorded frames and the final state hash (None if the session
+    never finished)"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    magic, version, seed, num_colors, grid_w, grid_h, screen_w, screen_h, coverage, word_count, maps_length = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(path + " isn't a version " + str(VERSION) + " replay log")
+    offset = HEADER.size
+    maps = data[offset:offset + maps_length].decode("utf-8").split("\n")
+    offset += maps_length
+
+    header = {"seed": seed, "num_colors": num_colors, "grid_dims": (grid_w, grid_h),
+              "screen_dimensions": (screen_w, screen_h), "coverage_target": None if math.isnan(coverage) else coverage,
+              "word_count": word_count, "maps": maps}
+
+    frames = []
+    digest = None
+    while offset < len(data):
+        if data[offset] == RECORD_END:
+            digest = END.unpack_from(data, offset)[2]
+            break
+
+        _, event_count, x, y, flags = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        events = []
+        for _ in range(event_count):
+            event, offset = decode_event(data, offset)
+            events.append(event)
+        frames.append(inputs.FrameInput(events, (x, y), bool(flags & FLAG_LEFT_PRESSED),
+                                        bool(flags & FLAG_SHIFT_PRESSED)))
+
+    return header, frames, digest
+
+
+def make_game(header, input_source):
+    if header["word_count"] != len(const.WORDS):
+        print("Warning: the log was recorded with " + str(header["word_count"]) + " words but this word list has " +
+              str(len(const.WORDS)) + ", so the board will differ", file=sys.stderr)
+
+    random.seed(header["seed"])
+    return game.Game(header["maps"], header["grid_dims"], coverage_target=header["coverage_target"],
+                     num_colors=header["num_colors"], screen_dimensions=header["screen_dimensions"],
+                     input_source=input_source)
+
+
+def record(path, maps, grid_dims=(6, 5), seed=None, num_colors=None, coverage_target=None):
+    """Plays a game normally while logging its input to path. Returns the finished game"""
+    header = {"seed": random.getrandbits(64) if seed is None else seed,
+              "num_colors": game.Game.NUM_COLORS if num_colors is None else num_colors, "grid_dims": grid_dims,
+              "screen_dimensions": game.get_screen_dimensions(), "coverage_target": coverage_target,
+              "word_count": len(const.WORDS), "maps": list(maps)}
+    maps_data = "\n".join(header["maps"]).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, header["seed"], header["num_colors"], *grid_dims,
+                            *header["screen_dimensions"], float("nan") if coverage_target is None else coverage_target,
+                            header["word_count"], len(maps_data)) + maps_data)
+
+        recording = RecordingInput(f, inputs.LiveInput())
+        g = make_game(header, recording)
+        g.run_game()
+        f.write(END.pack(RECORD_END, recording.frames, get_state_hash(g)))
+    return g
+
+
+def replay(path):
+    """Runs a log through a game as fast as it'll go. Returns the finished game, how long each frame took in
+    milliseconds and the final state hash the log was recorded with"""
+    header, frames, digest = load_log(path)
+    g = make_game(header, ReplayInput(frames))
+    g.MAX_FPS = 0
+
+    times = []
+    g.renderer.draw_board()
+    while g.running:
+        start = time.perf_counter()
+        g.run_frame()
+        times.append((time.perf_counter() - start) * 1000)
+    return g, times, digest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Records color_game sessions and replays them headlessly")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="play a game while logging its input")
+    record_parser.add_argument("log")
+    record_parser.add_argument("--grid", default="6x5", help="grid size as WIDTHxHEIGHT")
+    record_parser.add_argument("--seed", type=int)
+    record_parser.add_argument("--colors", type=int, help="number of colors, random from 4 to 8 by default")
+    record_parser.add_argument("--coverage", type=float, help="coverage_target for the helper words")
+
+    play_parser = subparsers.add_parser("play", help="replay a log without a window and time its frames")
+    play_parser.add_argument("log")
+    play_parser.add_argument("--timings", help="where to write the frame timings as JSON")
+    args = parser.parse_args()
+
+    if args.command == "play":
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+
+    if args.command == "record":
+        record(args.log, ("DustII", "Ancient", "Mirage", "Office", "Agency", "Nuke", "Train", "Cache", "Overpass",
+                          "Inferno", "Vertigo", "Mocha", "Grind", "Premiere"),
+               tuple([int(n) for n in args.grid.lower().split("x")]), args.seed, args.colors, args.coverage)
+    else:
+        g, times, digest = replay(args.log)
+
+        ordered = sorted(times)
+        print("Frames: {}, total {:.1f}ms".format(len(times), sum(times)))
+        print("Frame ms: p50 {:.3f}, p95 {:.3f}, p99 {:.3f}, max {:.3f}".format(
+            *[ordered[min(int(p * len(ordered)), len(ordered) - 1)] for p in (.5, .95, .99)], ordered[-1]))
+
+        final = get_state_hash(g)
+        if digest is None:
+            print("Final state " + final.hex() + " (the recording never finished, nothing to check against)")
+        else:
+            print("Final state " + ("matches" if final == digest else "DIFFERS from") + " the recording")
+
+        if args.timings:
+            with open(args.timings, "w") as f:
+                json.dump({"log": args.log, "frame_ms": times, "final_state": final.hex(),
+                           "matches": None if digest is None else final == digest}, f)
+
+        if digest is not None and final != digest:
+            sys.exit(1)
@@ -49,6 +49,77 @@ class Object:
         pass
 
 
+class GlyphAtlas:
+    """Letters rendered once per game, keyed by (font size in whole pixels, letter, color). Colored words are built out
+    of these, and both versions of a word are shared by every tile with the same word and font size"""
+
+    def __init__(self):
+        self.glyphs = {}
+        self.words = {}
+        self.color_bars = {}
+
+    def get_glyph(self, size, letter, color):
+        key = (size, letter, color)
+        if key not in self.glyphs:
+            self.glyphs[key] = const.get_word_font(size).render(letter, True, color)
+        return self.glyphs[key]
+
+    # Gets the black and the multicolor renderings of a word
+    def get_word(self, size, word, game):
+        key = (size, word)
+        if key in self.words:
+            return self.words[key]
+
+        font = const.get_word_font(size)
+        rendered_word_black = font.render(word, True, (0, 0, 0))
+        # Creates colored version of word
+        rendered_word_color = pygame.Surface((rendered_word_black.get_width(), rendered_word_black.get_height()),
+                                             pygame.SRCALPHA, 32).convert_alpha()
+        # Tracks cursor position
+        cur_pos = 0
+        # Blits each letter in a different color
+        for letter in word:
+            # Gets color
+            col = game.get_letter_color(letter)
+            # If character isn't a letter, turns it black
+            if col == -1:
+                col = (0, 0, 0)
+            else:
+                col = col.rgb
+            # Draws letter
+            rendered_word_color.blit(self.get_glyph(size, letter, col), (cur_pos, 0))
+            # Shifts cursor
+            cur_pos += font.size(letter)[0]*0.99
+
+        self.words[key] = (rendered_word_black, rendered_word_color)
+        return self.words[key]
+
+    # Gets the row of color circles shown on tiles of the given width containing the given colors
+    def get_color_bar(self, tile_width, colors):
+        key = (tile_width, tuple([c.rgb for c in colors]))
+        if key in self.color_bars:
+            return self.color_bars[key]
+
+        color_circle_width = Tile.PERCENT_COLOR_CIRCLE_WIDTH * tile_width
+        if len(colors) == 1:
+            color_surf = pygame.Surface((color_circle_width, color_circle_width), pygame.SRCALPHA, 32).convert_alpha()
+            pygame.draw.circle(color_surf, colors[0].rgb, (color_circle_width/2,
+                                                           color_circle_width/2),
+                               color_circle_width / 2)
+        else:
+            spread_width = tile_width - (Tile.MARGIN_PERCENT_FUNCTION(len(colors)) * tile_width) * 2
+            all_color_circle_width = color_circle_width * len(colors)
+            gap_width = (spread_width - all_color_circle_width) / (len(colors) - 1)
+            color_surf = pygame.Surface((spread_width, color_circle_width), pygame.SRCALPHA, 32).convert_alpha()
+            for i in range(len(colors)):
+                pygame.draw.circle(color_surf, colors[i].rgb,
+                                   ((color_circle_width / 2) + ((gap_width+color_circle_width) * i),
+                                    color_circle_width / 2), color_circle_width / 2)
+
+        self.color_bars[key] = color_surf
+        return color_surf
+
+
 class Tile(Object):
 
     SHADOW_SHIFT = 2
@@ -82,10 +153,15 @@ class Tile(Object):
 
         # Sets physics body
         self.physics_body = pygame.Rect(0, 0, tile_width, tile_width)
-        # Sets render body
-        self.render_body = pygame.Surface((tile_width, tile_width)).convert_alpha()
-
+        self.physics_body.center = self.pos
 
+        # Surfaces are built when first needed: the color bar on the first draw, the words once they're shown. Each is
+        # kept for the last width it was drawn at, which only changes with the camera's zoom
+        self.color_surf = None
+        self.color_surf_width = None
+        self.rendered_word_black = None
+        self.rendered_word_color = None
+        self.word_surfs_width = None
 
         # Gets all colors within this tile's word
         self.all_colors = const.remove_dupes_keep_order(list([i for i in [game.get_letter_color(letter) for letter in self.word] if i != -1]))
@@ -93,94 +169,105 @@ class Tile(Object):
         if self.tile_type == Tile.TILE_TYPES.HELPER and random.randint(1, 5) == 5:
             self.reveal(game)
 
-        # Generates word
-        max_font_size = Tile.MAX_FONT_SIZE_PERCENT * self.tile_width
-
-        constant_font_size = 5
-        constant_word_width = const.get_word_font(constant_font_size).size(self.word)[0]
-
-        desired_word_width = self.tile_width * Tile.WORD_WIDTH_PERCENT
-        # Performs ratio to find desired font size
-        desired_font_size = (desired_word_width * constant_font_size) / constant_word_width
-        desired_font_size = desired_font_size if desired_font_size < max_font_size else max_font_size
-
-        font = const.get_word_font(desired_font_size)
-
-        self.rendered_word_black = font.render(self.word, True, (0, 0, 0))
-        # Creates colored version of word
-        self.rendered_word_color = pygame.Surface((self.rendered_word_black.get_width(),
-                                                   self.rendered_word_black.get_height()),
-                                                  pygame.SRCALPHA, 32).convert_alpha()
-        # Tracks cursor position
-        cur_pos = 0
-        # Blits each letter in a different color
-        for letter in self.word:
-            # Gets color
-            col = game.get_letter_color(letter)
-            # If character isn't a letter, turns it black
-            if col == -1:
-                col = (0, 0, 0)
-            else:
-                col = col.rgb
-            # Draws letter
-            self.rendered_word_color.blit(font.render(letter, True, col), (cur_pos, 0))
-            # Shifts cursor
-            cur_pos += font.size(letter)[0]*0.99
-
-        # Generates color circle display bar
-        color_circle_width = Tile.PERCENT_COLOR_CIRCLE_WIDTH * self.tile_width
-        if len(self.all_colors) == 1:
-            self.color_surf = pygame.Surface((color_circle_width, color_circle_width), pygame.SRCALPHA, 32).convert_alpha()
-            pygame.draw.circle(self.color_surf, self.all_colors[0].rgb, (color_circle_width/2,
-                                                                         color_circle_width/2),
-                               color_circle_width / 2)
+    # Gets the black and multicolor renderings of the word, sized to fit the tile drawn at the given width
+    def get_word_surfs(self, game, width):
+        if self.word_surfs_width != width:
+            max_font_size = Tile.MAX_FONT_SIZE_PERCENT * width
+
+            constant_font_size = 5
+            constant_word_width = const.get_word_font(constant_font_size).size(self.word)[0]
+
+            desired_word_width = width * Tile.WORD_WIDTH_PERCENT
+            # Performs ratio to find desired font size
+            desired_font_size = (desired_word_width * constant_font_size) / constant_word_width
+            desired_font_size = desired_font_size if desired_font_size < max_font_size else max_font_size
+
+            self.rendered_word_black, self.rendered_word_color = game.glyph_atlas.get_word(int(desired_font_size),
+                                                                                         self.word, game)
+            self.word_surfs_width = width
+        return self.rendered_word_black, self.rendered_word_color
+
+    # Gets the bar of circles showing which colors are in the word
+    def get_color_surf(self, game, width):
+        if self.color_surf_width != width:
+            self.color_surf = game.glyph_atlas.get_color_bar(width, self.all_colors)
+            self.color_surf_width = width
+        return self.color_surf
+
+    # Builds everything the tile can show at the current zoom ahead of time
+    def warm(self, game):
+        self.get_word_surfs(game, self.tile_width * game.camera.zoom)
+        self.get_color_surf(game, self.tile_width * game.camera.zoom)
+
+    def get_background_color(self):
+        if not self.is_revealed:
+            return 130, 130, 130
+        elif self.tile_type != Tile.TILE_TYPES.MAP:
+            return 180, 180, 180
+        elif self.is_eliminated:
+            return 180, 150, 150
         else:
-            spread_width = self.tile_width - (Tile.MARGIN_PERCENT_FUNCTION(len(self.all_colors)) * self.tile_width) * 2
-            all_color_circle_width = color_circle_width * len(self.all_colors)
-            gap_width = (spread_width - all_color_circle_width) / (len(self.all_colors) - 1)
-            self.color_surf = pygame.Surface((spread_width, color_circle_width), pygame.SRCALPHA, 32).convert_alpha()
-            for i in range(len(self.all_colors)):
-                pygame.draw.circle(self.color_surf, self.all_colors[i].rgb,
-                                   ((color_circle_width / 2) + ((gap_width+color_circle_width) * i),
-                                    color_circle_width / 2), color_circle_width / 2)
+            return 150, 180, 150
 
     def render(self, screen, game):
+        # Tiles are laid out on the board, the camera says where and how big they show up on screen
+        zoom = game.camera.zoom
+        width = self.tile_width * zoom
+        center = game.camera.to_screen(self.pos)
+        shadow_shift = Tile.SHADOW_SHIFT * zoom
+        border_radius = int(10 * zoom)
+
         # Accounts for shadow shift
-        actual_tile_center = (self.pos[0] + (1 if self.is_revealed else -1) * Tile.SHADOW_SHIFT,
-                              self.pos[1] + (1 if self.is_revealed else -1) * Tile.SHADOW_SHIFT)
+        actual_tile_center = (center[0] + (1 if self.is_revealed else -1) * shadow_shift,
+                              center[1] + (1 if self.is_revealed else -1) * shadow_shift)
 
         # Shadow DUDES
-        pygame.draw.rect(screen, (110, 110, 110) if self.is_revealed else (70, 70, 70),
-                         self.render_body.get_rect(center=(self.pos[0] + (-1 if self.is_revealed else 1) * Tile.SHADOW_SHIFT,
-                                                           self.pos[1] + (-1 if self.is_revealed else 1) * Tile.SHADOW_SHIFT)), border_radius=10)
+        body = pygame.Rect(0, 0, width, width)
+        body.center = (center[0] + (-1 if self.is_revealed else 1) * shadow_shift,
+                       center[1] + (-1 if self.is_revealed else 1) * shadow_shift)
+        pygame.draw.rect(screen, (110, 110, 110) if self.is_revealed else (70, 70, 70), body, border_radius=border_radius)
 
         # Actual tile BG
-        if not self.is_revealed:
-            col = (130, 130, 130)
-        elif self.tile_type != Tile.TILE_TYPES.MAP:
-            col = (180, 180, 180)
-        elif self.is_eliminated:
-            col = (180, 150, 150)
-        else:
-            col = (150, 180, 150)
-        pygame.draw.rect(screen, col, self.render_body.get_rect(center=actual_tile_center), border_radius=10)
+        body.center = actual_tile_center
+        pygame.draw.rect(screen, self.get_background_color(), body, border_radius=border_radius)
 
         # Text
         if self.is_revealed:
-            screen.blit(self.rendered_word_color,
-                        self.rendered_word_color.get_rect(
+            rendered_word_black, rendered_word_color = self.get_word_surfs(game, width)
+            screen.blit(rendered_word_color,
+                        rendered_word_color.get_rect(
                             center=(actual_tile_center[0],
-                                    actual_tile_center[1]-(Tile.COLOR_TEXT_SHIFT_FROM_CENTER_PERCENT*self.tile_width))))
-            screen.blit(self.rendered_word_black, self.rendered_word_black.get_rect(center=actual_tile_center))
+                                    actual_tile_center[1]-(Tile.COLOR_TEXT_SHIFT_FROM_CENTER_PERCENT*width))))
+            screen.blit(rendered_word_black, rendered_word_black.get_rect(center=actual_tile_center))
 
         # Color info display
-        screen.blit(self.color_surf,
-                    self.color_surf.get_rect(center=(actual_tile_center[0],
-                                                     actual_tile_center[1] + Tile.COLOR_BAR_SHIFT_FROM_CENTER_PERCENT*self.tile_width)))
+        color_surf = self.get_color_surf(game, width)
+        screen.blit(color_surf,
+                    color_surf.get_rect(center=(actual_tile_center[0],
+                                                actual_tile_center[1] + Tile.COLOR_BAR_SHIFT_FROM_CENTER_PERCENT*width)))
+
+    def render_lod(self, surface, scale):
+        """Draws a simplified tile for the zoomed out board: just its background with a stripe per color along the
+        bottom. scale maps board coordinates to the surface's"""
+        body = pygame.Rect(int(self.physics_body.left * scale), int(self.physics_body.top * scale),
+                           max(int(self.tile_width * scale), 1), max(int(self.tile_width * scale), 1))
+        surface.fill(self.get_background_color(), body)
+
+        if self.all_colors:
+            stripe_height = max(body.height // 4, 1)
+            for i, color in enumerate(self.all_colors):
+                left = body.left + body.width * i // len(self.all_colors)
+                right = body.left + body.width * (i + 1) // len(self.all_colors)
+                surface.fill(color.rgb, (left, body.bottom - stripe_height, right - left, stripe_height))
+
+    # Area the tile draws over, shadow included
+    def get_bounds(self):
+        return self.physics_body.inflate(Tile.SHADOW_SHIFT * 4 + 4, Tile.SHADOW_SHIFT * 4 + 4)
 
     def reveal(self, game):
         if not self.is_revealed:
             self.is_revealed = True
+            game.dirty_tiles.append(self)
             game.update_revealed_letters(self.word)
             game.do_update_displays = True
             game.newly_revealed_tile = self
@@ -188,9 +275,10 @@ class Tile(Object):
     def update(self, screen, game):
         self.physics_body.center = self.pos
 
-        for event in game.events:
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == pygame.BUTTON_RIGHT and self.physics_body.collidepoint(event.pos):
-                self.reveal(game)
+    # Called by the game for clicks that land on this tile
+    def on_click(self, event, game):
+        if event.button == pygame.BUTTON_RIGHT:
+            self.reveal(game)
 
 
 
@@ -0,0 +1,250 @@
+import bisect
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+
+# Where the word list comes from and where it's cached. CSMAP_WORD_LIST points the cache at another file, which is how
+# machines without a network get their list
+WORD_LIST_URL = "https://www.mit.edu/~ecprice/wordlist.100000"
+WORD_LIST_PATH = os.environ.get("CSMAP_WORD_LIST",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), "wordlist.100000"))
+
+# Line offsets and the letter mask index are saved next to the list so they only get built once. The header holds the
+# size and modification time of the list they were built from
+INDEX_SUFFIX = ".idx"
+MASK_INDEX_SUFFIX = ".masks"
+INDEX_HEADER = struct.Struct("<QQ")
+MASK_INDEX_HEADER = struct.Struct("<QQII")
+
+
+# Packs the letters of a word into a 26 bit integer, bit 0 being "a"
+def get_letter_mask(word):
+    mask = 0
+    for letter in word.lower():
+        if "a" <= letter <= "z":
+            mask |= 1 << (ord(letter) - 97)
+    return mask
+
+
+def fetch_word_list(path=WORD_LIST_PATH, url=WORD_LIST_URL, timeout=10):
+    """Downloads the word list into the cache. Only needed once per machine"""
+    import requests
+
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+
+    # Writes to a temporary file first so a failed download never leaves half a list behind
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".part", "wb") as f:
+        f.write(response.content)
+    os.replace(path + ".part", path)
+
+
+class WordSource:
+    """Word list read straight out of a memory mapped file. Only the start offset of each line is kept in memory, and a
+    word is decoded when it's asked for"""
+
+    def __init__(self, path=WORD_LIST_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        stat = os.fstat(self.file.fileno())
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+
+        self.offsets = self.load_offsets()
+        if self.offsets is None:
+            self.offsets = self.build_offsets()
+            self.save_offsets()
+
+    def build_offsets(self):
+        offsets = array("I")
+        pos = 0
+        size = len(self.map)
+        while pos < size:
+            end = self.map.find(b"\n", pos)
+            if end == -1:
+                end = size
+            if end > pos:
+                offsets.append(pos)
+            pos = end + 1
+        return offsets
+
+    def load_offsets(self):
+        try:
+            with open(self.path + INDEX_SUFFIX, "rb") as f:
+                if INDEX_HEADER.unpack(f.read(INDEX_HEADER.size)) != self.stamp:
+                    return None
+                offsets = array("I")
+                offsets.frombytes(f.read())
+                return offsets
+        except (OSError, struct.error, ValueError):
+            return None
+
+    def save_offsets(self):
+        try:
+            with open(self.path + INDEX_SUFFIX, "wb") as f:
+                f.write(INDEX_HEADER.pack(*self.stamp))
+                f.write(self.offsets.tobytes())
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        start = self.offsets[i]
+        end = self.map.find(b"\n", start)
+        if end == -1:
+            end = len(self.map)
+        return self.map[start:end].decode("utf-8").strip()
+
+    def get_word(self, rng=random):
+        return self[rng.randrange(len(self.offsets))]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class WordIndex:
+    """Groups the words of a WordSource by (letter mask, length). The groups are stored as flat arrays sorted by key,
+    with key_starts[i]:key_starts[i + 1] giving the slice of word_ids in group i"""
+
+    def __init__(self, source):
+        self.source = source
+        if not self.load():
+            self.build()
+            self.save()
+
+    def build(self):
+        groups = {}
+        for i in range(len(self.source)):
+            word = self.source[i]
+            groups.setdefault((get_letter_mask(word), min(len(word), 255)), []).append(i)
+
+        self.key_masks = array("I")
+        self.key_lengths = array("B")
+        self.key_starts = array("I", [0])
+        self.word_ids = array("I")
+        for key in sorted(groups):
+            self.key_masks.append(key[0])
+            self.key_lengths.append(key[1])
+            self.word_ids.extend(groups[key])
+            self.key_starts.append(len(self.word_ids))
+
+    def load(self):
+        try:
+            with open(self.source.path + MASK_INDEX_SUFFIX, "rb") as f:
+                size, mtime, num_keys, num_words = MASK_INDEX_HEADER.unpack(f.read(MASK_INDEX_HEADER.size))
+                if (size, mtime) != self.source.stamp:
+                    return False
+                self.key_masks = array("I")
+                self.key_masks.fromfile(f, num_keys)
+                self.key_lengths = array("B")
+                self.key_lengths.fromfile(f, num_keys)
+                self.key_starts = array("I")
+                self.key_starts.fromfile(f, num_keys + 1)
+                self.word_ids = array("I")
+                self.word_ids.fromfile(f, num_words)
+                return True
+        except (OSError, EOFError, struct.error, ValueError):
+            return False
+
+    def save(self):
+        try:
+            with open(self.source.path + MASK_INDEX_SUFFIX, "wb") as f:
+                f.write(MASK_INDEX_HEADER.pack(*self.source.stamp, len(self.key_masks), len(self.word_ids)))
+                for arr in (self.key_masks, self.key_lengths, self.key_starts, self.word_ids):
+                    arr.tofile(f)
+        except OSError:
+            pass
+
+    # Gets the words with every letter group in cover touched at least once and no letters from avoid. Scans every
+    # key, so use a CoverageTable for repeated queries against the same groups
+    def find(self, cover=(), avoid=0, max_length=None):
+        found = []
+        for key in range(len(self.key_masks)):
+            mask = self.key_masks[key]
+            if mask & avoid or (max_length is not None and self.key_lengths[key] > max_length):
+                continue
+            if all(mask & group for group in cover):
+                found += [self.source[i] for i in self.word_ids[self.key_starts[key]:self.key_starts[key + 1]]]
+        return found
+
+
+class CoverageTable:
+    """Buckets the keys of a WordIndex by which of the given letter groups (eg. the letters of each game color) they
+    touch. Bit j of a bucket's signature is set when its words contain a letter from group j. Built once per set of
+    groups, after which picking a word by the groups it covers or avoids only looks at the buckets"""
+
+    def __init__(self, index, groups, max_length=None):
+        self.index = index
+        self.groups = list(groups)
+        self.all_groups = (1 << len(self.groups)) - 1
+
+        # Keys of each bucket, along with the running word count up to the end of each key so a word can be found with
+        # a binary search. Picks are then uniform over words rather than over keys
+        self.buckets = {}
+        self.bucket_counts = {}
+        for key in range(len(index.key_masks)):
+            if max_length is not None and index.key_lengths[key] > max_length:
+                continue
+            signature = self.get_mask_signature(index.key_masks[key])
+            if signature not in self.buckets:
+                self.buckets[signature] = array("I")
+                self.bucket_counts[signature] = array("I")
+            counts = self.bucket_counts[signature]
+            self.buckets[signature].append(key)
+            counts.append((counts[-1] if counts else 0) + index.key_starts[key + 1] - index.key_starts[key])
+
+    def get_mask_signature(self, mask):
+        signature = 0
+        for j, group in enumerate(self.groups):
+            if mask & group:
+                signature |= 1 << j
+        return signature
+
+    def get_signature(self, word):
+        return self.get_mask_signature(get_letter_mask(word))
+
+    # Gets a random word touching every group in cover and none in avoid (both signatures). With partial set, words
+    # touching every group are left out. Returns None when no word fits
+    def pick(self, cover=0, avoid=0, partial=False, rng=random):
+        signatures = [s for s in self.buckets if s & cover == cover and not s & avoid
+                      and not (partial and s == self.all_groups)]
+        total = sum([self.bucket_counts[s][-1] for s in signatures])
+        if not total:
+            return None
+
+        # Finds the bucket, then the key, holding the chosen word
+        target = rng.randrange(total)
+        for signature in signatures:
+            counts = self.bucket_counts[signature]
+            if target < counts[-1]:
+                i = bisect.bisect_right(counts, target)
+                key = self.buckets[signature][i]
+                offset = target - (counts[i - 1] if i else 0)
+                return self.index.source[self.index.word_ids[self.index.key_starts[key] + offset]]
+            target -= counts[-1]
+
+
+def load_word_source(path=WORD_LIST_PATH):
+    """Opens the cached word list, downloading it first if there's no cache yet"""
+    if not os.path.exists(path):
+        try:
+            fetch_word_list(path)
+        except Exception as e:
+            raise RuntimeError("No word list at " + path + " and it couldn't be downloaded (" + str(e) + "). Copy "
+                               "the list from " + WORD_LIST_URL + " there or set CSMAP_WORD_LIST") from e
+    return WordSource(path)
+
+
+# Running this file warms the cache ahead of time
+if __name__ == "__main__":
+    cache_path = sys.argv[1] if len(sys.argv) > 1 else WORD_LIST_PATH
+    fetch_word_list(cache_path)
+    print("Cached " + str(len(WordSource(cache_path))) + " words at " + cache_path)
@@ -0,0 +1,215 @@
+import random
+import math
+
+
+# Default CSGO map pool
+MAPS = ["Dust II", "Mirage", "Cache", "Inferno", "Overpass", "Nuke", "Train", "Vertigo", "Agency", "Office", "Ancient"]
+
+
+def get_helper_string(length_lower_bound=4, length_upper_bound=7, rng=random):
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    return "".join([rng.choice(alphabet) for _ in range(rng.randint(length_lower_bound, length_upper_bound))])
+
+
+# Packs the letters of a word into a 26 bit integer, bit 0 being "a"
+def get_letter_mask(word):
+    mask = 0
+    for letter in word.lower():
+        if "a" <= letter <= "z":
+            mask |= 1 << (ord(letter) - 97)
+    return mask
+
+
+class MapTile:
+    CANCEL_COLOR = (210, 0, 0)
+    SET_COLOR = (0, 190, 0)
+    HELPER_COLOR = (25, 50, 200)
+
+    def __init__(self, map_name, is_map):
+        self.map = map_name
+        self.is_map = is_map
+        self.revealed = not is_map
+        self.color = MapTile.SET_COLOR if is_map else MapTile.HELPER_COLOR
+
+        # Letters of the map name as a bitmask, used by LetterCounter
+        self.mask = get_letter_mask(self.map)
+
+        # How many letters the tile shares with the hidden tiles in its row and column. Kept current by LetterCounter,
+        # which recounts only the row and column of each revealed tile
+        self.row = 0
+        self.col = 0
+
+    @property
+    def cancelled(self):
+        return self.color == MapTile.CANCEL_COLOR
+
+    def __repr__(self):
+        return self.map
+
+
+class LetterCounter:
+    """Tracks, for every row and column of the grid, how many hidden tiles contain each letter. A tile's row/col value
+    is then the sum of those tallies over its own letters, so a reveal only has to recount one row and one column"""
+
+    def __init__(self, tiles, w, h):
+        self.tiles = tiles
+        self.w = w
+        self.h = h
+
+        self.row_counts = [[0] * 26 for _ in range(h)]
+        self.col_counts = [[0] * 26 for _ in range(w)]
+        for idx, tile in enumerate(self.tiles):
+            if not tile.revealed:
+                self.add_tile(idx, 1)
+
+        for row in range(h):
+            self.update_row(row)
+        for col in range(w):
+            self.update_col(col)
+
+    def add_tile(self, idx, amount):
+        row_counts = self.row_counts[idx // self.w]
+        col_counts = self.col_counts[idx % self.w]
+        mask = self.tiles[idx].mask
+        letter = 0
+        while mask:
+            if mask & 1:
+                row_counts[letter] += amount
+                col_counts[letter] += amount
+            mask >>= 1
+            letter += 1
+
+    @staticmethod
+    def get_count(tile, counts):
+        total = 0
+        mask = tile.mask
+        letter = 0
+        while mask:
+            if mask & 1:
+                total += counts[letter]
+            mask >>= 1
+            letter += 1
+
+        # A hidden tile is part of its own tallies, but it shouldn't count itself
+        if not tile.revealed:
+            total -= tile.mask.bit_count()
+        return total
+
+    def update_row(self, row):
+        counts = self.row_counts[row]
+        for tile in self.tiles[row * self.w: (row + 1) * self.w]:
+            tile.row = LetterCounter.get_count(tile, counts)
+
+    def update_col(self, col):
+        counts = self.col_counts[col]
+        for tile in self.tiles[col::self.w]:
+            tile.col = LetterCounter.get_count(tile, counts)
+
+    # Reveals a tile and recounts only the row and column it belongs to
+    def reveal(self, idx):
+        if self.tiles[idx].revealed:
+            return
+
+        self.tiles[idx].revealed = True
+        self.add_tile(idx, -1)
+        self.update_row(idx // self.w)
+        self.update_col(idx % self.w)
+
+
+class TilePool:
+    """Unordered set of tiles with O(1) removal, kept as a list plus an index lookup so that sampling without
+    replacement costs O(k) no matter how many tiles are left"""
+
+    def __init__(self, tiles, rng=random):
+        self.rng = rng
+        self.tiles = list(tiles)
+        self.positions = {tile: i for i, tile in enumerate(self.tiles)}
+
+    def discard(self, tile):
+        i = self.positions.pop(tile, None)
+        if i is None:
+            return
+
+        # Fills the gap with the last tile
+        last = self.tiles.pop()
+        if i < len(self.tiles):
+            self.tiles[i] = last
+            self.positions[last] = i
+
+    # Picks up to k distinct tiles
+    def sample(self, k):
+        return self.rng.sample(self.tiles, min(k, len(self.tiles)))
+
+    def __len__(self):
+        return len(self.tiles)
+
+
+class MapGridEngine:
+    """Rules of the map grid game with no pygame involved. Tiles are stepped with reveal(idx), where idx is the tile's
+    position in the grid (row * width + col)"""
+
+    def __init__(self, maps=MAPS, helper_string_count=9, eliminatable_maps_length=4, width=4, rng=random,
+                 track_counts=True):
+        self.rng = rng
+
+        # Names of all tiles, the actual maps followed by helper strings (initially revealed tiles to help figure out
+        # where maps are)
+        self.maps = list(maps)
+        self.names = self.maps + [get_helper_string(rng=rng) for _ in range(helper_string_count)]
+
+        # Creates tiles and shuffles them
+        self.tiles = [MapTile(name, i < len(self.maps)) for i, name in enumerate(self.names)]
+        rng.shuffle(self.tiles)
+
+        # Width and height of tile grid
+        self.width = width
+        self.height = math.ceil(len(self.tiles) / width)
+
+        # Hidden map tiles that can still be picked for elimination
+        self.pool = TilePool([t for t in self.tiles if t.is_map], rng)
+
+        # Each turn, how many maps should be chosen as possible for elimination
+        self.eliminatable_maps_length = eliminatable_maps_length
+        self.eliminatable_maps = self.pool.sample(self.eliminatable_maps_length)
+
+        # Row and col values are only needed by players looking at them, so simulations can skip them
+        self.letter_counter = LetterCounter(self.tiles, self.width, self.height) if track_counts else None
+
+        self.clicks = 0
+        # Maps revealed without being cancelled
+        self.set_count = 0
+
+    # Reveals a tile, returning False if there was nothing to reveal
+    def reveal(self, idx):
+        tile = self.tiles[idx]
+        if tile.revealed:
+            return False
+
+        # Reveals tile, recounting the row and col values of just the row and column it's in
+        if self.letter_counter is not None:
+            self.letter_counter.reveal(idx)
+        else:
+            tile.revealed = True
+        self.pool.discard(tile)
+
+        # If map was queued to be eliminated, set it to cancelled mode
+        if tile in self.eliminatable_maps:
+            tile.color = MapTile.CANCEL_COLOR
+        # Otherwise it's set. Helpers start revealed, so every tile that gets here is a map
+        else:
+            self.set_count += 1
+
+        # Creates new set of eliminating maps for next round
+        self.eliminatable_maps = self.pool.sample(self.eliminatable_maps_length)
+
+        self.clicks += 1
+        return True
+
+    # Indices of the tiles that can still be clicked
+    def get_hidden(self):
+        return [i for i, t in enumerate(self.tiles) if not t.revealed]
+
+    # The game is over once every map has been revealed
+    @property
+    def finished(self):
+        return not len(self.pool)
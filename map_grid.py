@@ -1,7 +1,9 @@
-import pygame
-import random
-import copy
 import math
+import pygame
+import numpy as np
+from collections import OrderedDict
+from map_engine import MAPS, MapGridEngine
+import profiler
 
 pygame.init()
 
@@ -22,72 +24,53 @@ def posscale(*coordinate, divisor=600):
         return coordinate[0] / divisor * SCREEN_SIZE[0]
 
 
-def get_helper_string(length_lower_bound=4, length_upper_bound=7):
-    alphabet = "abcdefghijklmnopqrstuvwxyz"
-    return "".join([random.choice(alphabet) for _ in range(random.randint(length_lower_bound, length_upper_bound))])
-
-
-def get_eliminatables(map_tiles, length):
-    choices = []
-    for _ in range(length):
-        valid = False
-        while not valid:
-            choice = random.choice(map_tiles)
-            if choice not in choices and choice.map in eliminatable:
-                choices.append(choice)
-                valid = True
+# Counts the common letters of every pair of names at once. Each name becomes a row of a character presence matrix,
+# so the pairwise counts are that matrix multiplied by its own transpose
+def get_common_letter_counts(names):
+    names = [name.lower() for name in names]
+    chars = {c: i for i, c in enumerate(sorted(set("".join(names))))}
 
-    return choices
+    presence = np.zeros((len(names), len(chars)), dtype=np.int32)
+    for i, name in enumerate(names):
+        presence[i, [chars[c] for c in set(name)]] = 1
 
+    return presence @ presence.T
 
-def get_common_letter_count(word1, word2):
-    count = 0
-    for letter in set(word1.lower()):
-        if letter in word2.lower():
-            count += 1
-    return count
 
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces keyed by (font, text, color). Text that changes (row/col values, the
+    eliminating maps line) gets a new key, so stale surfaces simply age out or can be dropped with discard()"""
 
-class MapTile:
-    CANCEL_COLOR = (210, 0, 0)
-    SET_COLOR = (0, 190, 0)
-    HELPER_COLOR = (25, 50, 200)
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
 
-    def __init__(self, map_name):
-        self.map = map_name
-        self.revealed = False if self.map in eliminatable else True
-        self.color = MapTile.SET_COLOR if self.map in eliminatable else MapTile.HELPER_COLOR
+        # Counters for checking the hit rate
+        self.hits = 0
+        self.misses = 0
 
-        # Counts how many common letters in row and column
-        self.row = 0
-        self.col = 0
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
 
-    def set_row_and_col(self, w, h, self_idx, tiles):
-        slices = [(self_idx // w) * w, ((self_idx // w) + 1) * w]
-        if slices[1] > len(tiles):
-            slices[1] = len(tiles)
+        self.misses += 1
+        surf = font.render(text, True, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surf
 
-        # Counts how many map names in the same row have a common letter
-        row_count = 0
-        for tile in [t for t in tiles[slices[0]: slices[1]] if t != self and not t.revealed]:
-            for letter in set(self.map.lower()):
-                if letter != " " and letter in tile.map.lower():
-                    row_count += 1
-
-        # Same for columns
-        col_count = 0
-        for tile in [t for t in
-                     [tiles[(self_idx % w) + (i * w)] for i in list(range(h)) if (self_idx % w) + (i * w) < len(tiles)]
-                     if t != self and not t.revealed]:
-            for letter in set(self.map.lower()):
-                if letter != " " and letter in tile.map.lower():
-                    col_count += 1
-
-        self.row = row_count
-        self.col = col_count
+    def discard(self, font, text, color):
+        self.surfaces.pop((font, text, color), None)
 
     def __repr__(self):
-        return self.map
+        total = self.hits + self.misses
+        return "TextCache(size={}, hits={}, misses={}, hit_rate={}%)".format(
+            len(self.surfaces), self.hits, self.misses, round(self.hits / total * 100, 1) if total else 0)
 
 
 # SCREEN SIZE
@@ -96,27 +79,22 @@ screen = pygame.display.set_mode(SCREEN_SIZE, pygame.DOUBLEBUF)
 
 SHOW_SIDEBAR = True
 
-# Names of all tiles
-map_names = ["Dust II", "Mirage", "Cache", "Inferno", "Overpass", "Nuke", "Train", "Vertigo", "Agency", "Office",
-             "Ancient"]
-# Actual CSGO maps to differentiate from helper strings
-eliminatable = copy.copy(map_names)
-
 # Adds helper strings (initially revealed tiles to help figure out where maps are)
 helper_string_count = 9
-map_names += [get_helper_string() for _ in range(helper_string_count)]
-
-# Creates tiles and shuffles them
-map_tiles = [MapTile(name) for name in map_names]
-random.shuffle(map_tiles)
 
 # Each turn, how many maps should be chosen as possible for elimination
 eliminatable_maps_length = 4
-eliminatable_maps = get_eliminatables(map_tiles, eliminatable_maps_length)
 
-# Width and height of tile grid, as well as the square side length of each tile
+# Width of tile grid
 width = 4
-height = math.ceil(len(map_names) / width)
+
+# Game state, shuffled tiles and the rules applied to them
+engine = MapGridEngine(MAPS, helper_string_count, eliminatable_maps_length, width)
+map_names = engine.names
+map_tiles = engine.tiles
+
+# Height of tile grid, as well as the square side length of each tile
+height = engine.height
 square_dim = SCREEN_SIZE[1] // max(width, height)
 
 # Fonts and pre-rendered text
@@ -124,33 +102,76 @@ arial_font = pygame.font.SysFont("Arial", cscale(32))
 arial_font_small = pygame.font.SysFont("Arial", cscale(18))
 arial_font_medium = pygame.font.SysFont("Arial", cscale(25))
 ELIMINATE_TEXT = arial_font_small.render("ELIMINATING", True, (0, 0, 0))
+ELIMINATING_MAPS_COLOR = (200, 0, 0)
+
+# Caches all text rendered inside the draw loop
+text_cache = TextCache()
 
 # Generates right sidebar with map helper
-rendered_names = [arial_font_small.render(m, True, (255, 0, 255)) for m in map_names]
-max_name_length = max([surf.get_width() for surf in rendered_names])
+# Only the part of the sidebar inside its viewport gets drawn, so it scrolls with the mouse wheel when there are too
+# many names to fit (shift + wheel scrolls sideways)
+SIDEBAR_MAX_WIDTH = 700
+SIDEBAR_NAME_COLOR = (255, 0, 255)
 
-common_counts = [[get_common_letter_count(word1, word2) if word2 != word1 else "-" for word2 in map_names] for word1 in map_names]
-rendered_counts = [[arial_font_small.render(str(cnt), True, (min(200 - i * 5, 255), min(160 - i * 5, 255), min(50 + i * 5, 255))) for cnt in cnt_arr] for i, cnt_arr in enumerate(common_counts)]
+common_counts = get_common_letter_counts(map_names)
 
-count_width = rendered_counts[0][0].get_width() * 2
+max_name_length = max([arial_font_small.size(m)[0] for m in map_names])
+line_height = arial_font_small.get_height()
+count_width = arial_font_small.size("-")[0] * 2
 
 padding = cscale(5)
-sidebar_width = int(max_name_length + count_width * len(rendered_counts) * 2.1 + padding * len(rendered_counts))
-sidebar_height = rendered_names[0].get_height() * len(rendered_names) + padding * 2
+count_step = count_width * padding * .5
+sidebar_width = int(max_name_length + count_width * len(map_names) * 2.1 + padding * len(map_names))
+sidebar_height = line_height * len(map_names) + padding * 2
+
+# Part of the sidebar on screen and how far it has been scrolled
+sidebar_view = pygame.Rect(SCREEN_SIZE[0], 0, min(sidebar_width, SIDEBAR_MAX_WIDTH) if SHOW_SIDEBAR else 0,
+                           SCREEN_SIZE[1] + cscale(100))
+sidebar_scroll = [0, 0]
+
+# Number glyphs are shared by every cell with the same count and column color
+sidebar_glyphs = TextCache(max_size=4096)
+
+
+# Gets the color of a column of counts
+def get_count_color(i):
+    return max(min(200 - i * 5, 255), 0), max(min(160 - i * 5, 255), 0), min(50 + i * 5, 255)
+
+
+# Scrolls the sidebar by the given amount, returns whether it moved
+def scroll_sidebar(dx, dy):
+    old_scroll = list(sidebar_scroll)
+    sidebar_scroll[0] = max(min(sidebar_scroll[0] + dx, sidebar_width - sidebar_view.width), 0)
+    sidebar_scroll[1] = max(min(sidebar_scroll[1] + dy, sidebar_height - sidebar_view.height), 0)
+    return sidebar_scroll != old_scroll
+
+
+# Draws the visible window of the sidebar
+def draw_sidebar():
+    # Names scroll vertically with their row, but stay pinned to the left
+    first_row = max(int((sidebar_scroll[1] - padding) // line_height), 0)
+    last_row = min(int((sidebar_scroll[1] + sidebar_view.height - padding) // line_height), len(map_names) - 1)
+    for row in range(first_row, last_row + 1):
+        screen.blit(sidebar_glyphs.render(arial_font_small, map_names[row], SIDEBAR_NAME_COLOR),
+                    (sidebar_view.x + padding, padding + row * line_height - sidebar_scroll[1]))
+
+    # Only the count columns inside the viewport are visited
+    counts_x = sidebar_view.x + padding * 3 + max_name_length
+    first_col = max(int((sidebar_scroll[0] - count_width) // count_step), 0)
+    last_col = min(int((sidebar_scroll[0] + sidebar_view.width) // count_step), len(map_names) - 1)
+    for col in range(first_col, last_col + 1):
+        color = get_count_color(col)
+        x = counts_x + col * count_step - sidebar_scroll[0]
+        if x + count_width < counts_x:
+            continue
+        for row in range(first_row, last_row + 1):
+            screen.blit(sidebar_glyphs.render(arial_font_small, "-" if row == col else str(common_counts[col][row]),
+                                              color),
+                        (x, padding + row * line_height - sidebar_scroll[1]))
 
-sidebar_surface = pygame.Surface((sidebar_width, sidebar_height), pygame.SRCALPHA, 32).convert_alpha()
-
-for i in range(len(rendered_names)):
-    sidebar_surface.blit(rendered_names[i], (padding, padding + i * rendered_names[0].get_height()))
-
-for cnt_arr_id in range(len(rendered_counts)):
-    for cnt_id in range(len(rendered_counts[cnt_arr_id])):
-        sidebar_surface.blit(rendered_counts[cnt_arr_id][cnt_id],
-                             (padding * 3 + max_name_length + cnt_arr_id * count_width * padding * .5,
-                              padding + cnt_id * rendered_names[0].get_height()))
 
 # Creates screen
-screen = pygame.display.set_mode([SCREEN_SIZE[0] + (sidebar_width if SHOW_SIDEBAR else 0), SCREEN_SIZE[1] + cscale(100)], pygame.DOUBLEBUF)
+screen = pygame.display.set_mode([SCREEN_SIZE[0] + sidebar_view.width, SCREEN_SIZE[1] + cscale(100)], pygame.DOUBLEBUF)
 
 # Pre-made tile box surfaces
 hidden_square = pygame.Surface([square_dim for _ in range(2)]).convert_alpha()
@@ -163,24 +184,145 @@ pygame.draw.rect(revealed_square, (0, 0, 0), pygame.Rect((0, 0), (square_dim, sq
 # The offset from the top left corner of the screen where to start drawing the grid (centers it)
 shift = [(SCREEN_SIZE[0] - width * square_dim) / 2, (SCREEN_SIZE[1] - height * square_dim) / 2]
 
-# Sets rows and columns for all tiles
-# Each row and column value tells you how many common letters there are in all the maps in the same row
-def set_rows_and_cols():
-    for i in range(len(map_tiles)):
-        map_tiles[i].set_row_and_col(width, height, i, map_tiles)
-set_rows_and_cols()
 
+# When enabled, the loop sleeps until an event arrives and only pushes the screen regions that changed to the display
+DIRTY_RECT_RENDERING = True
+
+# Static layer with everything that never changes: background and footer header
+background = pygame.Surface(screen.get_size()).convert()
+background.fill((200, 200, 200))
+background.blit(ELIMINATE_TEXT, ELIMINATE_TEXT.get_rect(center=(SCREEN_SIZE[0] / 2, SCREEN_SIZE[1] + cscale(15))))
+
+
+# Gets the square a tile occupies on screen
+def get_tile_rect(i):
+    return pygame.Rect((shift[0] + (i % width) * square_dim, shift[1] + (i // width) * square_dim), (square_dim, square_dim))
+
+
+# Gets the surfaces to blit for a tile along with where they go
+def get_tile_blits(i):
+    # Gets the top left corner and center of the current tile being drawn
+    top_left = (shift[0] + (i % width) * square_dim, shift[1] + (i // width) * square_dim)
+    center = [pos + square_dim / 2 for pos in top_left]
+
+    # Tile square if tile is hidden
+    if not map_tiles[i].revealed:
+        return [(hidden_square, hidden_square.get_rect(topleft=top_left))]
+
+    # Otherwise, map name in its respective color as well as the row and column values
+    rendered_text = text_cache.render(arial_font, map_tiles[i].map, map_tiles[i].color)
+    row_text = text_cache.render(arial_font_small, "row: " + str(map_tiles[i].row), (110, 0, 180))
+    col_text = text_cache.render(arial_font_small, "col: " + str(map_tiles[i].col), (0, 110, 180))
+
+    return [(rendered_text, rendered_text.get_rect(center=center)),
+            (row_text, row_text.get_rect(center=[center[0] - square_dim / height, center[1] + square_dim / width])),
+            (col_text, col_text.get_rect(center=[center[0] + square_dim / height, center[1] + square_dim / width])),
+            (revealed_square, revealed_square.get_rect(topleft=top_left))]
+
+
+# Gets the full area a tile draws over, including map names that overflow the square
+def get_tile_bounds(i):
+    return get_tile_rect(i).unionall([rect for _, rect in get_tile_blits(i)])
+
+
+# Gets how many squares past its own a revealed tile's text can reach, sideways and up or down. Row/col values count at
+# most 26 letters for each tile in the row or column, which bounds how many digits they can have
+def get_text_reach():
+    digits = "8" * len(str(26 * max(width, height)))
+    value_width = max(arial_font_small.size("row: " + digits)[0], arial_font_small.size("col: " + digits)[0])
+    reach_x = max(max([arial_font.size(m)[0] for m in map_names]) / 2, square_dim / height + value_width / 2)
+    reach_y = max(arial_font.get_height() / 2, square_dim / width + arial_font_small.get_height() / 2)
+
+    # One more square makes up for text rects being rounded to whole pixels
+    return (math.ceil(max(reach_x - square_dim / 2, 0) / square_dim) + 1,
+            math.ceil(max(reach_y - square_dim / 2, 0) / square_dim) + 1)
+
+
+text_reach = get_text_reach()
 
-running = True
-while running:
-    # Clear Screen
-    screen.fill((200, 200, 200))
+
+# Gets the text displaying the next eliminating maps at the bottom
+def get_footer_blit():
+    rendered_eliminating_maps = text_cache.render(arial_font_medium, ", ".join([t.map for t in engine.eliminatable_maps]),
+                                                  ELIMINATING_MAPS_COLOR)
+    return rendered_eliminating_maps, rendered_eliminating_maps.get_rect(center=(SCREEN_SIZE[0] / 2,
+                                                                                 SCREEN_SIZE[1] + cscale(55)))
+
+
+# Redraws everything inside the given screen rect
+def draw_region(rect):
+    rect = rect.clip(screen.get_rect())
+    screen.set_clip(rect)
+    screen.blit(background, rect, rect)
+
+    # Only visits tiles around the region, as far out as text overflowing a square can come from
+    first_row = max(int((rect.top - shift[1]) // square_dim) - text_reach[1], 0)
+    last_row = min(int((rect.bottom - shift[1]) // square_dim) + text_reach[1], height - 1)
+    first_col = max(int((rect.left - shift[0]) // square_dim) - text_reach[0], 0)
+    last_col = min(int((rect.right - shift[0]) // square_dim) + text_reach[0], width - 1)
+    for row in range(first_row, last_row + 1):
+        for col in range(first_col, last_col + 1):
+            if row * width + col < len(map_tiles):
+                screen.blits(get_tile_blits(row * width + col), False)
+
+    screen.blit(*get_footer_blit())
+
+    # Sidebar is kept inside its viewport
+    if sidebar_view.colliderect(rect):
+        screen.set_clip(rect.clip(sidebar_view))
+        draw_sidebar()
+
+    screen.set_clip(None)
+
+
+# Where the profiler overlay was last drawn
+overlay_rect = None
+
+
+# Gets the events for the next frame, sleeping until something happens when only redrawing changes. The wait isn't
+# part of the frame's timings
+def get_events():
+    if DIRTY_RECT_RENDERING:
+        profiler.PROFILER.begin("wait")
+        events = [pygame.event.wait()]
+        profiler.PROFILER.end("wait")
+    else:
+        events = []
+    return events + pygame.event.get()
+
+
+# Handles a frame's events and redraws what they changed. Returns False once the window is closed
+def run_frame(events):
+    global overlay_rect
+    running = True
+
+    # Screen regions that need to be redrawn this frame
+    dirty_rects = []
+
+    profiler.PROFILER.begin("frame")
+    profiler.PROFILER.begin("events")
 
     # Event loop
-    for event in pygame.event.get():
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
 
+        # Window was uncovered or restored, so everything needs redrawing
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            dirty_rects.append(screen.get_rect())
+
+        elif event.type == pygame.KEYDOWN and event.key == profiler.OVERLAY_TOGGLE_KEY:
+            profiler.PROFILER.toggle_overlay()
+
+        # Scrolls the sidebar
+        elif event.type == pygame.MOUSEWHEEL and sidebar_view.collidepoint(pygame.mouse.get_pos()):
+            if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                moved = scroll_sidebar(-event.y * count_step, 0)
+            else:
+                moved = scroll_sidebar(event.x * count_step, -event.y * line_height * 3)
+            if moved:
+                dirty_rects.append(sidebar_view.copy())
+
         elif event.type == pygame.MOUSEBUTTONDOWN:
             if event.button == pygame.BUTTON_LEFT:
                 # If the click is within the grid range
@@ -193,53 +335,60 @@ while running:
                     # If the click wasn't on a nonexistent tile (out of range) or on an open tile
                     if idx < len(map_tiles) and not map_tiles[idx].revealed:
 
-                        # Reveals tile
-                        map_tiles[idx].revealed = True
-
-                        # If map was queued to be eliminated, set it to cancelled mode
-                        if map_tiles[idx] in eliminatable_maps:
-                            map_tiles[idx].color = MapTile.CANCEL_COLOR
-
-                        # Creates new set of eliminating maps for next round
-                        eliminatable_maps = get_eliminatables(map_tiles, eliminatable_maps_length)
-
-                        # Recalculates rows and cols
-                        set_rows_and_cols()
-
-    for i in range(len(map_tiles)):
-
-        # Gets the top left corner and center of the current tile being drawn
-        top_left = (shift[0] + (i % width) * square_dim, shift[1] + (i // width) * square_dim)
-        center = [pos + square_dim / 2 for pos in top_left]
-
-        # Draws tile square if tile is hidden
-        if not map_tiles[i].revealed:
-            screen.blit(hidden_square, top_left)
+                        # The revealed tile changes, as do the row/col values of the open tiles sharing its row and
+                        # col. Both their old and new text get redrawn, since a value can get shorter
+                        changed = set(range((idx // width) * width, min((idx // width + 1) * width, len(map_tiles))))
+                        changed.update(range(idx % width, len(map_tiles), width))
+                        dirty_rects += [get_tile_bounds(i) for i in changed if map_tiles[i].revealed]
+
+                        # Reveals tile, dropping the old eliminating maps line's cached surface
+                        dirty_rects.append(get_footer_blit()[1])
+                        text_cache.discard(arial_font_medium, ", ".join([t.map for t in engine.eliminatable_maps]),
+                                           ELIMINATING_MAPS_COLOR)
+                        engine.reveal(idx)
+                        dirty_rects.append(get_footer_blit()[1])
+
+                        dirty_rects += [get_tile_bounds(i) for i in changed if map_tiles[i].revealed]
+
+    profiler.PROFILER.end("events")
+
+    # Profiler overlay goes over everything, so the area it covered gets redrawn first
+    overlay = profiler.PROFILER.render_overlay()
+    if overlay_rect is not None:
+        dirty_rects.append(overlay_rect)
+    overlay_rect = overlay.get_rect() if overlay is not None else None
+    if overlay_rect is not None:
+        dirty_rects.append(overlay_rect)
+
+    profiler.PROFILER.begin("draw")
+    if not DIRTY_RECT_RENDERING:
+        dirty_rects = [screen.get_rect()]
+    for rect in dirty_rects:
+        draw_region(rect)
+    if overlay is not None:
+        screen.blit(overlay, overlay_rect)
+    profiler.PROFILER.end("draw")
+
+    profiler.PROFILER.begin("flip")
+    if DIRTY_RECT_RENDERING:
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+    else:
+        pygame.display.update()
+    profiler.PROFILER.end("flip")
 
-        # Otherwise, Draws map name in its respective color as well as the row and column values
-        else:
-            rendered_text = arial_font.render(map_tiles[i].map, True, map_tiles[i].color)
-            screen.blit(rendered_text, rendered_text.get_rect(center=center))
+    profiler.PROFILER.end("frame")
+    profiler.PROFILER.end_frame()
 
-            row_text = arial_font_small.render("row: " + str(map_tiles[i].row), True, (110, 0, 180))
-            col_text = arial_font_small.render("col: " + str(map_tiles[i].col), True, (0, 110, 180))
-            screen.blit(row_text,
-                        row_text.get_rect(center=[center[0] - square_dim / height, center[1] + square_dim / width]))
-            screen.blit(col_text,
-                        col_text.get_rect(center=[center[0] + square_dim / height, center[1] + square_dim / width]))
+    return running
 
-            screen.blit(revealed_square, top_left)
 
-    # Draws text displaying the next eliminating maps at the bottom
-    rendered_eliminating_maps = arial_font_medium.render(", ".join([t.map for t in eliminatable_maps]), True,
-                                                         (200, 0, 0))
-    screen.blit(ELIMINATE_TEXT, ELIMINATE_TEXT.get_rect(center=(SCREEN_SIZE[0] / 2, SCREEN_SIZE[1] + cscale(15))))
-    screen.blit(rendered_eliminating_maps,
-                rendered_eliminating_maps.get_rect(center=(SCREEN_SIZE[0] / 2, SCREEN_SIZE[1] + cscale(55))))
+if __name__ == "__main__":
+    draw_region(screen.get_rect())
+    pygame.display.update()
 
-    # blits sidebar
-    if SHOW_SIDEBAR:
-        screen.blit(sidebar_surface, (SCREEN_SIZE[0], 0))
+    running = True
+    while running:
+        running = run_frame(get_events())
 
-    # Update Display
-    pygame.display.update()
+    profiler.PROFILER.finish()
@@ -0,0 +1,184 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+from map_engine import MAPS, MapGridEngine
+
+
+# How many games each worker task plays before reporting back
+CHUNK_SIZE = 10000
+
+
+# Clicks any hidden tile
+def pick_random(engine, rng):
+    return rng.choice(engine.get_hidden())
+
+
+# Clicks the hidden tile most likely to hold one of the eliminating maps, judging by the row/col values of the open
+# tiles sharing its row and column. A map can't sit somewhere that would push a neighbour past its shown value
+def pick_with_hints(engine, rng):
+    best_score = None
+    best = []
+    for idx in engine.get_hidden():
+        row_tiles = engine.tiles[(idx // engine.width) * engine.width: (idx // engine.width + 1) * engine.width]
+        col_tiles = engine.tiles[idx % engine.width::engine.width]
+
+        score = None
+        for target in engine.eliminatable_maps:
+            target_score = 0
+            for tiles, attr in ((row_tiles, "row"), (col_tiles, "col")):
+                for t in tiles:
+                    if t.revealed:
+                        common = (t.mask & target.mask).bit_count()
+                        value = getattr(t, attr)
+                        if common > value:
+                            target_score = None
+                            break
+                        if value:
+                            target_score += common / value
+                if target_score is None:
+                    break
+
+            if target_score is not None and (score is None or target_score > score):
+                score = target_score
+
+        if score is None:
+            continue
+        if best_score is None or score > best_score:
+            best_score = score
+            best = [idx]
+        elif score == best_score:
+            best.append(idx)
+
+    return rng.choice(best) if best else pick_random(engine, rng)
+
+
+STRATEGIES = {"random": pick_random, "hints": pick_with_hints}
+
+
+# Plays a game until every map is revealed. Returns the engine at the end, the click that first cancelled a map and the
+# click that set the target_sets-th map, either being None if it never happened
+def play_game(rng, strategy, maps, helper_string_count, eliminatable_maps_length, width, target_sets):
+    engine = MapGridEngine(maps, helper_string_count, eliminatable_maps_length, width, rng=rng,
+                           track_counts=strategy is not pick_random)
+
+    first_cancel = None
+    target_click = None
+    while not engine.finished:
+        idx = strategy(engine, rng)
+        engine.reveal(idx)
+        if first_cancel is None and engine.tiles[idx].cancelled:
+            first_cancel = engine.clicks
+        if target_click is None and engine.set_count == target_sets:
+            target_click = engine.clicks
+
+    return engine, first_cancel, target_click
+
+
+# Plays a chunk of games with its own seed and tallies the results
+def run_chunk(args):
+    seed, games, strategy_name, maps, helper_string_count, eliminatable_maps_length, width, target_sets = args
+    rng = random.Random(seed)
+    strategy = STRATEGIES[strategy_name]
+
+    target_clicks = Counter()
+    first_cancels = Counter()
+    cancelled_maps = Counter()
+    cancelled_counts = Counter()
+    for _ in range(games):
+        engine, first_cancel, target_click = play_game(rng, strategy, maps, helper_string_count,
+                                                       eliminatable_maps_length, width, target_sets)
+        cancelled = [t.map for t in engine.tiles if t.cancelled]
+
+        target_clicks[target_click] += 1
+        first_cancels[first_cancel] += 1
+        cancelled_maps.update(cancelled)
+        cancelled_counts[len(cancelled)] += 1
+
+    return target_clicks, first_cancels, cancelled_maps, cancelled_counts
+
+
+def simulate(games, strategy="hints", maps=MAPS, helper_string_count=9, eliminatable_maps_length=4, width=4,
+             target_sets=3, seed=0, workers=None):
+    """Plays games across a process pool. Every chunk gets a seed drawn from the given seed, so results only depend
+    on the arguments and not on how chunks get scheduled. Returns (target_clicks, first_cancels, cancelled_maps,
+    cancelled_counts) counters"""
+    seed_rng = random.Random(seed)
+    chunks = []
+    while games > 0:
+        chunks.append((seed_rng.getrandbits(64), min(games, CHUNK_SIZE), strategy, list(maps), helper_string_count,
+                       eliminatable_maps_length, width, target_sets))
+        games -= CHUNK_SIZE
+
+    results = [Counter() for _ in range(4)]
+    with Pool(workers) as pool:
+        for chunk_results in pool.imap_unordered(run_chunk, chunks):
+            for total, chunk_result in zip(results, chunk_results):
+                total.update(chunk_result)
+
+    return tuple(results)
+
+
+# Gets the value at the given fraction of a histogram's total count
+def get_percentile(histogram, fraction):
+    target = fraction * sum(histogram.values())
+    count = 0
+    for value in sorted(histogram, key=lambda v: float("inf") if v is None else v):
+        count += histogram[value]
+        if count >= target:
+            return value
+
+
+# None stands for something that never happened
+def format_value(value):
+    return "never" if value is None else str(value)
+
+
+def print_histogram(histogram, games, unit):
+    for value in sorted(histogram, key=lambda v: float("inf") if v is None else v):
+        print("    {:>5} {}: {:>6}%".format(format_value(value), unit, round(histogram[value] / games * 100, 2)))
+
+
+def print_report(games, target_clicks, first_cancels, cancelled_maps, cancelled_counts, maps=MAPS, target_sets=3):
+    print("Games played: " + str(games))
+
+    # A map is set when it's revealed without being cancelled. Games that cancel too many maps never get there
+    print("Clicks until {} maps are set, i.e. revealed without being cancelled:".format(target_sets))
+    reached = {value: count for value, count in target_clicks.items() if value is not None}
+    if reached:
+        mean = sum(value * count for value, count in reached.items()) / sum(reached.values())
+        print("    mean {}, p10 {}, p50 {}, p90 {}, max {} (over the games that got there)".format(
+            round(mean, 2), *[format_value(get_percentile(target_clicks, f)) for f in (.1, .5, .9)], max(reached)))
+    print_histogram(target_clicks, games, "clicks")
+
+    print("Clicks until the first map is cancelled:")
+    print_histogram(first_cancels, games, "clicks")
+
+    print("Maps cancelled per game:")
+    print_histogram(cancelled_counts, games, "maps")
+
+    print("How often each map gets cancelled:")
+    for map_name in sorted(maps, key=lambda m: -cancelled_maps[m]):
+        print("    {:<10} {:>6}%".format(map_name, round(cancelled_maps[map_name] / games * 100, 2)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays randomized map grid games and reports their outcomes")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="hints",
+                        help="how the simulated player picks tiles")
+    parser.add_argument("--helpers", type=int, default=9, help="helper_string_count")
+    parser.add_argument("--choices", type=int, default=4, help="eliminatable_maps_length")
+    parser.add_argument("--width", type=int, default=4)
+    parser.add_argument("--sets", type=int, default=3, help="how many maps have to be set for the main metric")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = simulate(args.games, args.strategy, MAPS, args.helpers, args.choices, args.width, args.sets, args.seed,
+                       args.workers)
+    print_report(args.games, *results, target_sets=args.sets)
+    print("Took " + str(round(time.perf_counter() - start, 2)) + "s")
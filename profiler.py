@@ -0,0 +1,163 @@
+import json
+import os
+import time
+from array import array
+
+import pygame
+
+# Shared by color_game and map_grid.py, so both loops (and anything running them together, like the benchmarks) report
+# to the same PROFILER. color_game's entry points put this directory on the path
+
+# Profiling is off unless CSMAP_PROFILE is set. CSMAP_PROFILE_TRACE names a file to write a Chrome trace (viewable in
+# chrome://tracing or Perfetto) to when the game closes
+ENABLED = bool(os.environ.get("CSMAP_PROFILE"))
+TRACE_PATH = os.environ.get("CSMAP_PROFILE_TRACE")
+
+# How many frames of timings each section keeps for its percentiles
+HISTORY = 240
+
+# Trace events stop being recorded past this many, so a long session can't eat all the memory
+MAX_TRACE_EVENTS = 1000000
+
+OVERLAY_TOGGLE_KEY = pygame.K_F3
+OVERLAY_PERCENTILES = (50, 95, 99)
+
+
+class Section:
+    """Timings of one named section. Every frame the section runs in adds its total time to a fixed size ring"""
+
+    def __init__(self, name, index, history):
+        self.name = name
+        self.index = index
+        self.ring = array("d", [0.0] * history)
+        self.pos = 0
+        self.count = 0
+
+        self.started = 0
+        self.frame_total = 0
+        self.ran = False
+
+    def push(self, value):
+        self.ring[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.ring)
+        self.count = min(self.count + 1, len(self.ring))
+
+    # Gets the given percentiles (0-100) of the recorded frames
+    def get_percentiles(self, percentiles):
+        values = sorted(self.ring[:self.count])
+        if not values:
+            return [0.0 for _ in percentiles]
+        return [values[min(int(p / 100 * len(values)), len(values) - 1)] for p in percentiles]
+
+
+class Profiler:
+    """Times named sections of a game loop. Wrap the work in begin(name) and end(name) (sections can nest or repeat
+    within a frame) and call end_frame() once per frame. Times are kept in milliseconds"""
+
+    def __init__(self, history=HISTORY, trace_path=TRACE_PATH):
+        self.history = history
+        self.sections = {}
+
+        self.overlay_visible = False
+        self.overlay_font = None
+
+        # Trace events as parallel arrays of section index, start and duration (nanoseconds since the profiler started)
+        self.trace_path = trace_path
+        self.origin = time.perf_counter_ns()
+        self.section_names = []
+        self.trace_ids = array("H")
+        self.trace_starts = array("q")
+        self.trace_durations = array("q")
+
+    def get_section(self, name):
+        if name not in self.sections:
+            self.sections[name] = Section(name, len(self.section_names), self.history)
+            self.section_names.append(name)
+        return self.sections[name]
+
+    def begin(self, name):
+        section = self.sections.get(name) or self.get_section(name)
+        section.started = time.perf_counter_ns()
+
+    def end(self, name):
+        now = time.perf_counter_ns()
+        section = self.sections[name]
+        section.frame_total += now - section.started
+        section.ran = True
+
+        if self.trace_path is not None and len(self.trace_ids) < MAX_TRACE_EVENTS:
+            self.trace_ids.append(section.index)
+            self.trace_starts.append(section.started - self.origin)
+            self.trace_durations.append(now - section.started)
+
+    def end_frame(self):
+        for section in self.sections.values():
+            if section.ran:
+                section.push(section.frame_total / 1e6)
+                section.frame_total = 0
+                section.ran = False
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+
+    def render_overlay(self):
+        """Gets a surface listing every section's percentiles, or None while the overlay is hidden"""
+        if not self.overlay_visible:
+            return None
+        if self.overlay_font is None:
+            self.overlay_font = pygame.font.Font(None, 18)
+
+        lines = ["{:<12}".format("ms") + "".join(["{:>8}".format("p" + str(p)) for p in OVERLAY_PERCENTILES])]
+        for section in self.sections.values():
+            lines.append("{:<12}".format(section.name[:12]) +
+                         "".join(["{:>8.2f}".format(v) for v in section.get_percentiles(OVERLAY_PERCENTILES)]))
+
+        rendered = [self.overlay_font.render(line, True, (255, 255, 255)) for line in lines]
+        surf = pygame.Surface((max([r.get_width() for r in rendered]) + 8,
+                               sum([r.get_height() for r in rendered]) + 8), pygame.SRCALPHA, 32)
+        surf.fill((0, 0, 0, 180))
+        y = 4
+        for r in rendered:
+            surf.blit(r, (4, y))
+            y += r.get_height()
+        return surf
+
+    def export_trace(self, path):
+        """Writes the recorded sections as Chrome trace events"""
+        events = [{"name": self.section_names[i], "ph": "X", "pid": 0, "tid": 0, "ts": start / 1000,
+                   "dur": duration / 1000}
+                  for i, start, duration in zip(self.trace_ids, self.trace_starts, self.trace_durations)]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    # Called when the game closes
+    def finish(self):
+        if self.trace_path is not None:
+            self.export_trace(self.trace_path)
+
+
+class NullProfiler:
+    """Stand-in used while profiling is disabled, so instrumented loops only pay for an empty method call"""
+
+    overlay_visible = False
+
+    def begin(self, name):
+        pass
+
+    def end(self, name):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def toggle_overlay(self):
+        pass
+
+    def render_overlay(self):
+        return None
+
+    def finish(self):
+        pass
+
+
+PROFILER = Profiler() if ENABLED else NullProfiler()
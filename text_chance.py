@@ -1,66 +1,335 @@
+import argparse
+import json
+import math
+import os
 import random
+import sys
+from fractions import Fraction
+from multiprocessing import Pool
 
 extensions = {1: "st", 2: "nd", 3: "rd"}
 extensions.setdefault(4, "th")
 
 
-def check_decimal(lst):
-    for itm in lst:
-        if itm[1] != int(itm[1]):
-            return False
-    return True
+# Turns weights into integers with the same ratios. They are scaled once by the lowest common denominator and then
+# reduced, so the totals stay small however many times a weight was halved or doubled. Floats are read by their
+# decimal value so 0.1 means 1/10 rather than the nearest binary fraction
+def get_integer_weights(maps):
+    weights = [Fraction(str(itm[1])) if isinstance(itm[1], float) else Fraction(itm[1]) for itm in maps]
+    scale = math.lcm(*[w.denominator for w in weights])
+    weights = [int(w * scale) for w in weights]
+    divisor = math.gcd(*weights) or 1
+    return [[itm[0], w // divisor] for itm, w in zip(maps, weights)]
 
 
-def get_map(lst, val):
-    count = 0
+class WeightedPool:
+    """Fenwick tree over integer weights. Finds the item a cumulative scan of the weights would land on for a value in
+    1..total, and removes drawn items, both in O(log n)"""
 
-    for map in lst:
-        if count < val <= count + map[1]:
-            return map
+    def __init__(self, items):
+        self.items = [list(itm) for itm in items]
+        self.tree = [0] * (len(self.items) + 1)
+        self.total = 0
 
-        count += map[1]
+        # How many items can still be drawn
+        self.count = len([itm for itm in self.items if itm[1] > 0])
+
+        # Builds the tree in O(n) by pushing each node's sum into its parent
+        for i, itm in enumerate(self.items):
+            self.tree[i + 1] += itm[1]
+            parent = (i + 1) + ((i + 1) & -(i + 1))
+            if parent <= len(self.items):
+                self.tree[parent] += self.tree[i + 1]
+            self.total += itm[1]
+
+    def add(self, idx, delta):
+        self.total += delta
+        i = idx + 1
+        while i <= len(self.items):
+            self.tree[i] += delta
+            i += i & -i
+
+    # Gets the index of the first item whose running total reaches val
+    def find(self, val):
+        pos = 0
+        step = 1 << (len(self.items).bit_length() - 1) if self.items else 0
+        while step:
+            if pos + step <= len(self.items) and self.tree[pos + step] < val:
+                pos += step
+                val -= self.tree[pos]
+            step >>= 1
+        return pos
+
+    def draw(self, rng=random):
+        return self.items[self.find(rng.randint(1, self.total))]
+
+    # Draws an item and takes it out of the pool
+    def pop(self, rng=random):
+        idx = self.find(rng.randint(1, self.total))
+        self.add(idx, -self.items[idx][1])
+        self.count -= 1
+        return self.items[idx]
+
+    def __len__(self):
+        return self.count
+
+
+class AliasTable:
+    """Walker alias table for drawing with replacement in O(1). Everything is kept in integers so the odds are exactly
+    weight / total, the same as a cumulative scan"""
+
+    def __init__(self, items):
+        self.items = [list(itm) for itm in items]
+        self.total = sum([itm[1] for itm in self.items])
+
+        # Each slot keeps its own item with probability prob[i] / total and otherwise hands over to alias[i]
+        n = len(self.items)
+        scaled = [itm[1] * n for itm in self.items]
+        self.prob = [self.total] * n
+        self.alias = list(range(n))
+
+        small = [i for i in range(n) if scaled[i] < self.total]
+        large = [i for i in range(n) if scaled[i] >= self.total]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= self.total - scaled[s]
+            (small if scaled[l] < self.total else large).append(l)
+
+    def draw(self, rng=random):
+        i = rng.randrange(len(self.items))
+        return self.items[i] if rng.randrange(self.total) < self.prob[i] else self.items[self.alias[i]]
+
+
+# Draws count maps one after the other without putting them back, returns their names in order
+def get_draw_order(maps, count, rng=random):
+    pool = WeightedPool(maps)
+    return [pool.pop(rng)[0] for _ in range(min(count, len(pool)))]
+
+
+# Largest pool the exact odds report handles, past this the number of draw states gets too big and it estimates instead
+EXACT_ODDS_MAX_MAPS = 14
+
+# Z score of the reported confidence intervals (95%)
+CONFIDENCE_Z = 1.96
+
+
+def get_exact_odds(maps, count):
+    """Exact chance of every map landing in each of the first count positions of the draw order. Works through the
+    draw one position at a time over the sets of maps already drawn, merging the paths that reach the same set, so
+    odds[i][pos] is the chance map i is drawn at position pos"""
+    weights = [itm[1] for itm in maps]
+    total = sum(weights)
+    odds = [[0.0] * count for _ in maps]
+
+    # Maps the bitmask of maps drawn so far to the chance of getting there and the weight already taken out
+    states = {0: (1.0, 0)}
+    for pos in range(count):
+        next_states = {}
+        for drawn, (chance, drawn_weight) in states.items():
+            remaining = total - drawn_weight
+            if not remaining:
+                continue
+            for i, weight in enumerate(weights):
+                if weight and not drawn >> i & 1:
+                    step_chance = chance * weight / remaining
+                    odds[i][pos] += step_chance
+                    next_drawn = drawn | 1 << i
+                    if next_drawn in next_states:
+                        next_states[next_drawn] = (next_states[next_drawn][0] + step_chance, drawn_weight + weight)
+                    else:
+                        next_states[next_drawn] = (step_chance, drawn_weight + weight)
+        states = next_states
+
+    return odds
+
+
+# Plays a chunk of draw orders with its own seed and counts where each map landed
+def run_odds_chunk(args):
+    seed, trials, maps, count = args
+    rng = random.Random(seed)
+    indexed = [[i, itm[1]] for i, itm in enumerate(maps)]
+
+    # One pool is reused for every trial, putting the drawn maps back afterwards
+    pool = WeightedPool(indexed)
+    count = min(count, len(pool))
+    hits = [[0] * count for _ in maps]
+    for _ in range(trials):
+        drawn = [pool.pop(rng) for _ in range(count)]
+        for pos, itm in enumerate(drawn):
+            hits[itm[0]][pos] += 1
+            pool.add(itm[0], itm[1])
+        pool.count += count
+    return hits
+
+
+def estimate_odds(maps, count, trials=20000, seed=0, workers=None, chunk_size=5000):
+    """Monte Carlo estimate of get_exact_odds spread over a process pool. Returns (odds, margins), where each margin is
+    the half width of the confidence interval around the matching odds"""
+    seed_rng = random.Random(seed)
+    chunks = []
+    remaining = trials
+    while remaining > 0:
+        chunks.append((seed_rng.getrandbits(64), min(remaining, chunk_size), [list(itm) for itm in maps], count))
+        remaining -= chunk_size
+
+    hits = [[0] * count for _ in maps]
+    with Pool(workers) as pool:
+        for chunk_hits in pool.imap_unordered(run_odds_chunk, chunks):
+            for i in range(len(maps)):
+                for pos in range(count):
+                    hits[i][pos] += chunk_hits[i][pos]
+
+    odds = [[h / trials for h in row] for row in hits]
+    margins = [[CONFIDENCE_Z * math.sqrt(p * (1 - p) / trials) for p in row] for row in odds]
+    return odds, margins
+
+
+# Gets the odds table, exactly for small pools and estimated for large ones. Margins are None when exact
+def get_odds(maps, count, trials=20000, seed=0, workers=None):
+    count = min(count, len([itm for itm in maps if itm[1]]))
+    if len(maps) <= EXACT_ODDS_MAX_MAPS:
+        return get_exact_odds(maps, count), None
+    return estimate_odds(maps, count, trials, seed, workers)
+
+
+def print_odds_report(maps, count, trials=20000, seed=0, workers=None):
+    odds, margins = get_odds(maps, count, trials, seed, workers)
+    count = len(odds[0]) if odds else 0
+
+    if margins is None:
+        print("Exact odds of each map landing in each spot:")
+    else:
+        print("Estimated odds of each map landing in each spot from " + str(trials) + " draws (+- is the 95% interval):")
+
+    name_width = max([len(itm[0]) for itm in maps] + [3])
+    print(" " * name_width + "".join(["{:>14}".format(str(pos + 1) + extensions.get(int(str(pos + 1)[-1]), "th"))
+                                      for pos in range(count)]) + "{:>10}".format("played"))
+    for i, itm in enumerate(maps):
+        if margins is None:
+            cells = ["{:>13.2f}%".format(p * 100) for p in odds[i]]
+        else:
+            cells = ["{:>7.2f}+-{:.2f}%".format(p * 100, m * 100) for p, m in zip(odds[i], margins[i])]
+        print("{:<{}}".format(itm[0], name_width) + "".join(cells) + "{:>9.2f}%".format(sum(odds[i]) * 100))
 
 
 MAPS_ARCH = ["Mirage", "Inferno", "Overpass", "Train", "Cache", "Dust II", "Agency", "Office", "Anubis", "Nuke", "Vertigo"]
 
-#           0         1          2            3       4        5          6         7          8       9         10
-MAPS = ["Mirage", "Inferno", "Overpass", "Train", "Cache", "Dust II", "Agency", "Office", "Anubis", "Nuke", "Vertigo"]
-MAPS = [[itm, 10] for itm in MAPS]
+# Weight every map starts with before halving and doubling
+BASE_WEIGHT = 10
+
+
+# Gets the position of a map in the pool from either its index or its name
+def get_map_index(pool, key):
+    if isinstance(key, str) and key.strip().isdigit():
+        key = int(key)
+    if isinstance(key, int):
+        if not 0 <= key < len(pool):
+            raise IndexError("map index " + str(key) + " is out of range")
+        return key
+
+    names = [m.lower() for m in pool]
+    if key.strip().lower() not in names:
+        raise ValueError("unknown map " + repr(key))
+    return names.index(key.strip().lower())
+
+
+# Splits a comma separated list of map indices or names, ignoring blanks
+def split_maps(text):
+    return [itm.strip() for itm in text.split(",") if itm.strip()]
+
+
+def get_weights(pool=MAPS_ARCH, half=(), double=(), eliminate=()):
+    """Applies the cut half, double and eliminate choices to a pool of map names. Choices can be indices into the pool
+    or map names. Returns [name, integer weight] pairs"""
+    maps = [[name, Fraction(BASE_WEIGHT)] for name in pool]
+
+    for key in half:
+        maps[get_map_index(pool, key)][1] /= 2
+
+    for key in double:
+        maps[get_map_index(pool, key)][1] *= 2
+
+    eliminated = set([get_map_index(pool, key) for key in eliminate])
+    maps = [itm for i, itm in enumerate(maps) if i not in eliminated]
+
+    return get_integer_weights(maps)
+
+
+def pick_maps(pool=MAPS_ARCH, half=(), double=(), eliminate=(), seed=None, count=10):
+    """Picks the order maps get played in without asking for input. The same seed and choices always give the same
+    order"""
+    return get_draw_order(get_weights(pool, half, double, eliminate), count, random.Random(seed))
+
+
+def stream_picks(lines, out):
+    """Resolves one JSON request per line, writing one JSON result per line as soon as it's ready. Requests look like
+    {"id": ..., "pool": [...], "half": [...], "double": [...], "eliminate": [...], "seed": ..., "count": ...}, where
+    everything is optional. Results echo the id with either an "order" or an "error" """
+    for line in lines:
+        if not line.strip():
+            continue
+
+        result = {}
+        try:
+            request = json.loads(line)
+            if "id" in request:
+                result["id"] = request["id"]
+            result["order"] = pick_maps(request.get("pool", MAPS_ARCH), request.get("half", ()),
+                                        request.get("double", ()), request.get("eliminate", ()),
+                                        request.get("seed"), request.get("count", 10))
+        except (ValueError, TypeError, IndexError, AttributeError) as e:
+            result["error"] = str(e)
+
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
 
-print(list(enumerate(MAPS_ARCH)))
-half = []
-double = []
+def print_order(final_choices):
+    [print("The " + str(x + 1) + extensions.get(int(str(x + 1)[-1]), "th") + " map being played is: " + final_choices[x]) for x in range(len(final_choices))]
 
-inp = input("cut half ").split(",")
-[half.append(int(i)) for i in inp]
 
-inp = input("double ").split(",")
-[double.append(int(i)) for i in inp]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Picks the order maps get played in. Asks for the choices when none "
+                                                 "are passed in")
+    parser.add_argument("--pool", help="comma separated map names to pick from instead of the default pool")
+    parser.add_argument("--half", help="comma separated indices or names of maps to cut in half")
+    parser.add_argument("--double", help="comma separated indices or names of maps to double")
+    parser.add_argument("--eliminate", help="comma separated indices or names of maps to eliminate")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible order")
+    parser.add_argument("--count", type=int, default=10, help="how many maps to pick")
+    parser.add_argument("--stream", action="store_true", help="read JSONL requests from stdin and write JSONL results")
+    parser.add_argument("--report", action="store_true", help="print the odds of each map landing in each spot")
+    parser.add_argument("--trials", type=int, default=20000, help="draws to estimate the odds with for large pools")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
 
-eliminate = int(input("eliminate "))
+    if args.stream:
+        stream_picks(sys.stdin, sys.stdout)
+        sys.exit()
 
-for idx in half:
-    MAPS[idx][1] /= 2
+    pool = split_maps(args.pool) if args.pool else MAPS_ARCH
+    interactive = args.half is None and args.double is None and args.eliminate is None
 
-for idx in double:
-    MAPS[idx][1] *= 2
+    if interactive:
+        print(list(enumerate(pool)))
+        half = split_maps(input("cut half "))
+        double = split_maps(input("double "))
+        eliminate = split_maps(input("eliminate "))
+    else:
+        half = split_maps(args.half or "")
+        double = split_maps(args.double or "")
+        eliminate = split_maps(args.eliminate or "")
 
-if eliminate is not None:
-    MAPS.pop(eliminate)
+    MAPS = get_weights(pool, half, double, eliminate)
 
-while not check_decimal(MAPS):
-    MAPS = [[itm[0], itm[1] * 10] for itm in MAPS]
-MAPS = [[itm[0], int(itm[1])] for itm in MAPS]
+    print(MAPS)
+    if args.report:
+        print_odds_report(MAPS, args.count, args.trials, workers=args.workers)
 
-print(MAPS)
-iters = 10
-final_choices = []
-for x in range(iters):
-    total = sum([itm[1] for itm in MAPS])
-    map = get_map(MAPS, random.randint(1, total))
-    if map in MAPS:
-        MAPS.remove(map)
-    final_choices.append(map[0])
-[print("The " + str(x + 1) + extensions.get(int(str(x + 1)[-1]), "th") + " map being played is: " + final_choices[x]) for x in range(len(final_choices))]
+    print_order(get_draw_order(MAPS, args.count, random.Random(args.seed)))
 
-input("Press ENTER to continue")
+    if interactive:
+        input("Press ENTER to continue")